@@ -3,7 +3,8 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 
 # Import your detection engine
-from detection.engine import score_url  
+from detection.engine import score_url
+from detection.result_cache import RESULT_CACHE
 
 app = Flask(__name__)
 CORS(app)  # allow React dev server to call
@@ -17,12 +18,17 @@ def detect_url():
 
     # Call your trained model
     try:
-        result = score_url(url)
+        result = RESULT_CACHE.get_or_score("url", url, score_url, sector="general")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
     return jsonify({"url": url, "result": result})
 
 
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(RESULT_CACHE.stats())
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -2,7 +2,10 @@ import os
 import json
 import firebase_admin
 from firebase_admin import credentials, firestore
-from detection.engine import score_url, score_app, score_content
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from detection.engine import score_urls, score_apps, score_contents
+from detection.config import SHARD_SIZE, PROBE_WORKERS
+from detection.firestore_shards import ShardWriter, iter_shards, read_meta
 from tqdm import tqdm
 
 # --- Auto-detect root directory ---
@@ -14,62 +17,97 @@ cred = credentials.Certificate(KEY_FILE)
 firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# --- Load schema from Firestore ---
+# --- Schema (sharded, or a legacy single "schema_json" field) ---
 SCHEMA_DOC = db.collection("threat_data").document("schema")
-raw_schema = SCHEMA_DOC.get().to_dict()
+SCORED_DOC = db.collection("threat_data").document("scored")
 
-if not raw_schema or "schema_json" not in raw_schema:
+schema_meta = read_meta(SCHEMA_DOC)
+if schema_meta.get("format") != "sharded" and "schema_json" not in schema_meta:
     print("❌ No schema found in Firestore!")
     exit()
 
-# Convert Firestore string → dict
-try:
-    schema = json.loads(raw_schema["schema_json"])
-except Exception as e:
-    print("❌ Failed to parse schema_json:", e)
-    exit()
-
-print(f"✅ Loaded schema with keys: {list(schema.keys())}")
+if "schema_json" in schema_meta:
+    try:
+        total = sum(len(v) for v in json.loads(schema_meta["schema_json"]).values() if isinstance(v, dict))
+    except Exception as e:
+        print("❌ Failed to parse schema_json:", e)
+        exit()
+    print("⚠️ Legacy single-field schema; run scripts/upload_schema.py to shard it")
+else:
+    total = sum(schema_meta.get("counts", {}).values())
+    print(f"✅ Sharded schema: {schema_meta.get('counts', {})}")
 
-# --- Prepare collection for scored results ---
-SCORED_COLLECTION = db.collection("threat_data").document("scored")
+# --- Score shards concurrently (each shard: concurrent probes, one ML call) ---
+SCORE_WORKERS = int(os.environ.get("FCM_SCORE_WORKERS", 4))   # shards scored at once
+# probes in flight per shard; every shard probes on the shared PROBE_WORKERS threads
+# and a probe's deadline includes waiting for one, so workers * probes should stay
+# within PROBE_WORKERS or probes time out before they start
+SCORE_PROBES = int(os.environ.get("FCM_SCORE_PROBES", max(1, PROBE_WORKERS // max(1, SCORE_WORKERS))))
+if SCORE_WORKERS * SCORE_PROBES > PROBE_WORKERS:
+    print(f"⚠️ {SCORE_WORKERS} workers x {SCORE_PROBES} probes exceeds the {PROBE_WORKERS} probe threads; "
+          f"expect probe timeouts")
 
-# --- Flatten schema into items ---
-items = []
-for bucket in ["urls", "apps", "content"]:
-    for k, v in schema.get(bucket, {}).items():
-        v["id"] = k
-        v["type"] = bucket
-        items.append(v)
+def score_batch(item_type, batch):
+    sectors = [it.get("sector", "general") for it in batch]
+    if item_type == "urls":
+        urls = [it.get("url") or it.get("link", "") for it in batch]
+        results = score_urls(urls, sector=sectors, concurrency=SCORE_PROBES)
+        # Probes cut off by their deadline: one retry (the late fetches have usually
+        # landed in the probe cache by now); still partial ones are left as None
+        retry = [i for i, r in enumerate(results) if r.get("partial")]
+        if retry:
+            again = score_urls([urls[i] for i in retry], sector=[sectors[i] for i in retry],
+                               concurrency=SCORE_PROBES)
+            for i, r in zip(retry, again):
+                results[i] = None if r.get("partial") else r
+        return results
+    if item_type == "apps":
+        links = [it.get("link") or it.get("url", "") for it in batch]
+        platforms = [it.get("platform", "android") for it in batch]
+        return score_apps(links, platform=platforms, sector=sectors)
+    texts = [it.get("text") or it.get("content") or "" for it in batch]
+    return score_contents(texts, sector=sectors)
 
-# --- Score items with progress bar ---
-scored_data = {"urls": {}, "apps": {}, "content": {}}
+def score_shard(bucket, items):
+    """{id: item} -> {id: {"sector", "score"}}; items whose network checks never finished are left out"""
+    ids = list(items)
+    batch = [items[k] for k in ids]
+    return {
+        k: {"sector": item.get("sector", "general"), "score": scored}
+        for k, item, scored in zip(ids, batch, score_batch(bucket, batch))
+        if scored is not None
+    }
 
-for item in tqdm(items, desc="Scoring items"):
-    item_id = item["id"]
-    item_type = item["type"]
-    sector = item.get("sector", "general")
+# Scored shards mirror schema shards (threat_data/scored/<bucket>/<shard>) and
+# are committed several per batch as they finish; only a bounded number of
+# shards is read ahead, so memory follows SHARD_SIZE, not the dataset.
+writer = ShardWriter(db, SCORED_DOC)
 
-    if item_type == "urls":
-        url = item.get("url") or item.get("link", "")
-        scored = score_url(url, sector=sector)
-    elif item_type == "apps":
-        platform = item.get("platform", "android")
-        link = item.get("link") or item.get("url", "")
-        scored = score_app(link, platform=platform, sector=sector)
-    elif item_type == "content":
-        text = item.get("text") or item.get("content") or ""
-        scored = score_content(text, sector=sector)
-    else:
-        print(f"⚠️ Unknown type '{item_type}' for item {item_id}")
-        continue
+skipped = 0
 
-scored_data[item_type][item_id] = {
-    "sector": sector,
-    "score": scored,
-}
+def collect(done):
+    global skipped
+    for fut in done:
+        bucket, shard, n = pending.pop(fut)
+        scored = fut.result()
+        skipped += n - len(scored)
+        writer.put(bucket, shard, scored)
+        bar.update(n)
 
+with ThreadPoolExecutor(max_workers=max(1, SCORE_WORKERS)) as pool, \
+        tqdm(total=total, desc="Scoring items") as bar:
+    pending = {}
+    for bucket, shard, items in iter_shards(SCHEMA_DOC, meta=schema_meta):
+        if not items:
+            continue
+        if len(pending) >= 2 * SCORE_WORKERS:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending[pool.submit(score_shard, bucket, items)] = (bucket, shard, len(items))
+    collect(list(pending))
 
-# --- Upload scored results ---
-SCORED_COLLECTION.set(scored_data)
-print("✅ Batch scoring complete and uploaded to Firestore")
+# --- Upload: flush last shards, drop stale ones, write the manifest ---
+writer.close(shard_size=schema_meta.get("shard_size", SHARD_SIZE))
+print(f"✅ Batch scoring complete and uploaded to Firestore: {writer.counts}")
+if skipped:
+    print(f"⚠️ {skipped} URLs left out: network probes timed out twice (rerun to score them)")
@@ -0,0 +1,168 @@
+# detection/bloom.py
+"""
+Scalable Bloom filter on disk, used for the set of URLs already trained on
+(formerly trained_urls.json, a JSON list loaded whole and rewritten on every
+training run).
+
+    trained_urls.bloom/meta.json   error rate, slices (capacity, count, bits, hashes)
+    trained_urls.bloom/000.bits    bit array of slice 0, memory-mapped
+    trained_urls.bloom/001.bits    ...
+
+Membership and add() touch k bits per slice through mmap, so nothing is
+loaded up front and an add writes only those bits. When the newest slice
+reaches its capacity a new one is added with twice the capacity and half
+the error rate (Almeida et al., "Scalable Bloom Filters"), which keeps the
+overall false-positive rate under `error_rate` however many items are
+added. A false positive means a URL is taken as already trained and
+skipped; there are no false negatives.
+"""
+import os
+import json
+import math
+import mmap
+import hashlib
+import threading
+
+from .config import (
+    TRAINED_SET_PATH, TRAINED_SET_ERROR_RATE, TRAINED_SET_CAPACITY, LEGACY_TRAINED_FILE,
+)
+
+GROWTH = 2          # capacity multiplier per new slice
+TIGHTENING = 0.5    # error-rate multiplier per new slice
+
+
+def _hashes(key: str):
+    """Two 64-bit hashes for double hashing (index_i = h1 + i * h2)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class _Slice:
+    def __init__(self, path: str, capacity: int, error_rate: float, count: int = 0):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = count
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, math.ceil(math.log2(1 / error_rate)))
+        size = (self.bits + 7) // 8
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def _positions(self, h1: int, h2: int):
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def contains(self, h1: int, h2: int) -> bool:
+        m = self._map
+        return all(m[p >> 3] & (1 << (p & 7)) for p in self._positions(h1, h2))
+
+    def add(self, h1: int, h2: int):
+        m = self._map
+        for p in self._positions(h1, h2):
+            m[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def meta(self) -> dict:
+        return {"capacity": self.capacity, "error_rate": self.error_rate, "count": self.count,
+                "bits": self.bits, "hashes": self.hashes}
+
+    def close(self):
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    def __init__(self, path: str = TRAINED_SET_PATH, error_rate: float = TRAINED_SET_ERROR_RATE,
+                 initial_capacity: int = TRAINED_SET_CAPACITY):
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # The error rate / capacity a filter was created with stay fixed
+            self.error_rate = meta["error_rate"]
+            self.initial_capacity = meta["initial_capacity"]
+            self.slices = [_Slice(self._slice_path(i), s["capacity"], s["error_rate"], s["count"])
+                           for i, s in enumerate(meta["slices"])]
+        else:
+            self.error_rate = error_rate
+            self.initial_capacity = max(1, initial_capacity)
+            self.slices = []
+        if not self.slices:
+            self._add_slice()
+
+    def _slice_path(self, i: int) -> str:
+        return os.path.join(self.path, f"{i:03d}.bits")
+
+    def _add_slice(self):
+        i = len(self.slices)
+        capacity = self.initial_capacity * GROWTH ** i
+        error_rate = self.error_rate * (1 - TIGHTENING) * TIGHTENING ** i
+        self.slices.append(_Slice(self._slice_path(i), capacity, error_rate))
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hashes(key)
+        return any(s.contains(h1, h2) for s in self.slices)
+
+    def add(self, key: str) -> bool:
+        """Add key; False if it was (probably) there already."""
+        h1, h2 = _hashes(key)
+        with self._lock:
+            if any(s.contains(h1, h2) for s in self.slices):
+                return False
+            if self.slices[-1].count >= self.slices[-1].capacity:
+                self._add_slice()
+            self.slices[-1].add(h1, h2)
+            return True
+
+    def update(self, keys) -> int:
+        """Add many keys; returns how many were new."""
+        return sum(self.add(k) for k in keys)
+
+    def __len__(self) -> int:
+        """Number of distinct keys added (approximate: false positives are not counted)."""
+        return sum(s.count for s in self.slices)
+
+    def save(self):
+        with self._lock:
+            for s in self.slices:
+                s._map.flush()
+            tmp = self.meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"error_rate": self.error_rate, "initial_capacity": self.initial_capacity,
+                           "slices": [s.meta() for s in self.slices]}, f, indent=1)
+            os.replace(tmp, self.meta_path)
+
+    def close(self):
+        self.save()
+        for s in self.slices:
+            s.close()
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self),
+            "slices": len(self.slices),
+            "bytes": sum((s.bits + 7) // 8 for s in self.slices),
+            "error_rate": self.error_rate,
+        }
+
+
+def load_trained_set(path: str = TRAINED_SET_PATH, legacy_file: str = LEGACY_TRAINED_FILE) -> ScalableBloomFilter:
+    """
+    The trained-URL filter. A filter that does not exist yet is seeded from a
+    legacy trained_urls.json, which is left in place but no longer read.
+    """
+    fresh = not os.path.exists(os.path.join(path, "meta.json"))
+    trained = ScalableBloomFilter(path)
+    if fresh and os.path.exists(legacy_file):
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            added = trained.update(json.load(f))
+        trained.save()
+        print(f"✅ Migrated {added} trained URLs from {legacy_file} into {path}")
+    return trained
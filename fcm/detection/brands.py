@@ -0,0 +1,161 @@
+# detection/brands.py
+"""
+Brand-impersonation index.
+
+Brands are loaded from detection/data/brands.txt (override with FCM_BRANDS_FILE)
+into a BK-tree keyed on Levenshtein distance, so a lookup only visits the part
+of the tree that can lie within the search radius instead of every brand.
+Node distances are computed with a score cutoff: anything beyond
+radius + the node's largest child edge cannot change the result.
+nearest() walks the same tree with a radius that shrinks to the best
+distance found so far, for the brand_similarity_score feature.
+"""
+import os
+import threading
+
+from Levenshtein import distance as levenshtein
+
+from .confusables import skeleton
+
+BRANDS_FILE = os.environ.get("FCM_BRANDS_FILE", os.path.join(os.path.dirname(__file__), "data", "brands.txt"))
+MAX_BRAND_DISTANCE = 2
+NO_MATCH_SCORE = 10     # brand_similarity_score of an empty domain
+
+
+def brand_radius(brand: str) -> int:
+    """Edit distance still counted as a lookalike; short names need (near-)exact hits."""
+    if len(brand) <= 3:
+        return 0
+    if len(brand) == 4:
+        return 1
+    return MAX_BRAND_DISTANCE
+
+
+class BKTree:
+    """Burkhard-Keller tree over strings with Levenshtein distance."""
+
+    def __init__(self, words=()):
+        self.root = None     # [word, {edge_distance: child_node}]
+        self.size = 0
+        for w in words:
+            self.add(w)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = [word, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = levenshtein(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [word, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, query: str, radius: int) -> list:
+        """[(word, distance)] for every word within `radius` of query."""
+        if self.root is None:
+            return []
+        out = []
+        stack = [self.root]
+        while stack:
+            word, children = stack.pop()
+            cutoff = radius + (max(children) if children else 0)
+            d = levenshtein(query, word, score_cutoff=cutoff)
+            if d <= radius:
+                out.append((word, d))
+            lo, hi = d - radius, d + radius
+            for edge, child in children.items():
+                if lo <= edge <= hi:
+                    stack.append(child)
+        return out
+
+    def nearest(self, query: str):
+        """(word, distance) of the closest word, or (None, None) for an empty tree."""
+        if self.root is None:
+            return None, None
+        best_word, best = None, None
+        stack = [self.root]
+        while stack:
+            word, children = stack.pop()
+            d = levenshtein(query, word)
+            if best is None or d < best:
+                best_word, best = word, d
+                if d == 0:
+                    break
+            lo, hi = d - best, d + best
+            for edge, child in children.items():
+                if lo < edge < hi:      # only children that can hold something closer than best
+                    stack.append(child)
+        return best_word, best
+
+
+class BrandIndex:
+    def __init__(self, brands):
+        self.brands = list(dict.fromkeys(b for b in brands if b))
+        self.order = {b: i for i, b in enumerate(self.brands)}
+        self.tree = BKTree(self.brands)
+        self.skeletons = {skeleton(b): b for b in self.brands}
+
+    @classmethod
+    def from_file(cls, path: str = BRANDS_FILE):
+        brands = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip().lower()
+                    if line and not line.startswith("#"):
+                        brands.append(line)
+        except Exception as e:
+            print("⚠️ Could not load brand list from", path, ":", e)
+        return cls(brands)
+
+    def imitated_brand(self, label_skeleton: str):
+        """Brand whose confusable skeleton equals the given one, or None."""
+        return self.skeletons.get(label_skeleton)
+
+    def lookup(self, label: str) -> dict:
+        """{brand: distance} for brands this single label imitates."""
+        if not label:
+            return {}
+        return {b: d for b, d in self.tree.search(label, MAX_BRAND_DISTANCE) if d <= brand_radius(b)}
+
+    def nearest_distance(self, label: str):
+        """Smallest edit distance from label to any brand (None without brands)."""
+        return self.tree.nearest(label)[1]
+
+    def match_host(self, domain: str, subdomain: str = "") -> dict:
+        """
+        Best distance per brand over the registrable domain label, each
+        subdomain label and each hyphen-separated token of those.
+        Returned in brand-list order.
+        """
+        labels = [domain] + [l for l in (subdomain or "").split(".") if l and l != "www"]
+        candidates = []
+        for label in labels:
+            candidates.append(label)
+            if "-" in label:
+                candidates.extend(t for t in label.split("-") if t)
+        best = {}
+        for c in dict.fromkeys(candidates):
+            for brand, d in self.lookup(c).items():
+                if d < best.get(brand, MAX_BRAND_DISTANCE + 1):
+                    best[brand] = d
+        return dict(sorted(best.items(), key=lambda kv: self.order[kv[0]]))
+
+
+_index = None
+_lock = threading.Lock()
+
+def get_brand_index() -> BrandIndex:
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = BrandIndex.from_file()
+    return _index
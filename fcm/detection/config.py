@@ -25,3 +25,103 @@ PATHS_OUT = {
     "app": "detections/apps",
     "content": "detections/content",
 }
+
+# Network probes (TLS / redirects / reachability) for URL scoring
+PROBE_DEADLINE = float(os.environ.get("FCM_PROBE_DEADLINE", 8))   # seconds per URL, whole probe included
+PROBE_TIMEOUT = float(os.environ.get("FCM_PROBE_TIMEOUT", 5))     # connect/read timeout of the single fetch
+PROBE_WORKERS = int(os.environ.get("FCM_PROBE_WORKERS", 32))      # threads shared by all in-flight probes
+
+# Async API (server.py): probe concurrency, load shedding and per-request deadline
+MAX_INFLIGHT_PROBES = int(os.environ.get("FCM_MAX_INFLIGHT_PROBES", PROBE_WORKERS))   # probes running at once
+MAX_QUEUED_PROBES = int(os.environ.get("FCM_MAX_QUEUED_PROBES", 256))     # requests waiting for a slot before 503
+REQUEST_DEADLINE = float(os.environ.get("FCM_REQUEST_DEADLINE", PROBE_DEADLINE))     # seconds per /detect request
+
+# Provisional detections awaiting / holding their enriched result (see provisional.py)
+DETECTION_STORE_SIZE = int(os.environ.get("FCM_DETECTION_STORE_SIZE", 10000))
+DETECTION_TTL = float(os.environ.get("FCM_DETECTION_TTL", 3600))          # seconds a detection_id stays fetchable
+ENRICH_DEADLINE = float(os.environ.get("FCM_ENRICH_DEADLINE", PROBE_DEADLINE))   # background probe deadline
+
+# Per-host probe cache (memory LRU + sqlite file; set FCM_PROBE_CACHE="" to keep it in memory only)
+PROBE_CACHE_PATH = os.environ.get(
+    "FCM_PROBE_CACHE",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "probe_cache.sqlite")
+)
+PROBE_CACHE_SIZE = int(os.environ.get("FCM_PROBE_CACHE_SIZE", 10000))              # entries kept in memory
+PROBE_CACHE_DISK_SIZE = int(os.environ.get("FCM_PROBE_CACHE_DISK_SIZE", 200000))   # entries kept on disk
+PROBE_CACHE_TTL = float(os.environ.get("FCM_PROBE_CACHE_TTL", 6 * 3600))           # seconds, successful probes
+PROBE_CACHE_NEGATIVE_TTL = float(os.environ.get("FCM_PROBE_CACHE_NEGATIVE_TTL", 600))  # timeouts / NXDOMAIN / refused
+PROBE_CACHE_KEY = os.environ.get("FCM_PROBE_CACHE_KEY", "host")                    # "host" or "domain"
+
+# Legit-domain whitelists (see reputation.py)
+LEGIT_DOMAINS_FILE = os.environ.get(
+    "FCM_LEGIT_DOMAINS",
+    os.path.join(os.path.dirname(__file__), "..", "data", "leg.txt")   # matched on registrable domain
+)
+LEGIT_HOSTS_FILE = os.environ.get(
+    "FCM_LEGIT_HOSTS",
+    os.path.join(os.path.dirname(__file__), "..", "legit.txt")         # matched on exact host
+)
+LEGIT_RELOAD_INTERVAL = float(os.environ.get("FCM_LEGIT_RELOAD_INTERVAL", 5))  # seconds between mtime checks
+
+# Keyword lists, one *.txt per list, compiled into one matcher (see keywords.py)
+KEYWORDS_DIR = os.environ.get(
+    "FCM_KEYWORDS_DIR",
+    os.path.join(os.path.dirname(__file__), "data", "keywords")
+)
+SECTORS_FILE = os.environ.get(
+    "FCM_SECTORS_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "sectors.json")
+)
+
+# /detect result cache (see result_cache.py); TTL by verdict: risky verdicts are stable, safe ones may turn
+RESULT_CACHE_SIZE = int(os.environ.get("FCM_RESULT_CACHE_SIZE", 20000))
+RESULT_TTL = {
+    "High Risk": float(os.environ.get("FCM_RESULT_TTL_HIGH", 24 * 3600)),
+    "Medium Risk": float(os.environ.get("FCM_RESULT_TTL_MEDIUM", 3600)),
+    "Safe": float(os.environ.get("FCM_RESULT_TTL_SAFE", 900)),
+}
+
+# Write-behind queue for detection records (see write_behind.py)
+WRITE_SINK = os.environ.get("FCM_WRITE_SINK", "firebase")              # "firebase", "file:<path>" or "sqlite:<path>"
+WRITE_QUEUE_SIZE = int(os.environ.get("FCM_WRITE_QUEUE_SIZE", 10000))   # records held in memory before spilling
+WRITE_BATCH_SIZE = int(os.environ.get("FCM_WRITE_BATCH_SIZE", 200))     # records per sink write
+WRITE_FLUSH_INTERVAL = float(os.environ.get("FCM_WRITE_FLUSH_INTERVAL", 1.0))   # max seconds a partial batch waits
+WRITE_MAX_RETRIES = int(os.environ.get("FCM_WRITE_MAX_RETRIES", 5))
+WRITE_SPILL_PATH = os.environ.get(
+    "FCM_WRITE_SPILL",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "pending_writes.jsonl")
+)
+
+# Sharded Firestore storage for threat_data/schema and threat_data/scored (see firestore_shards.py)
+SHARD_SIZE = int(os.environ.get("FCM_SHARD_SIZE", 200))              # items per shard document (kept well under 1 MiB)
+SHARD_BATCH_DOCS = int(os.environ.get("FCM_SHARD_BATCH_DOCS", 8))    # shard documents per batch commit
+
+# Append-only scored dataset replacing schema.json (see dataset.py)
+DATASET_DIR = os.environ.get(
+    "FCM_DATASET_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "dataset")
+)
+DATASET_PART_ROWS = int(os.environ.get("FCM_DATASET_PART_ROWS", 5000))   # records per part file
+LEGACY_SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "schema.json")
+
+# Feature store: extracted features keyed by normalized URL + extractor version (see feature_store.py)
+FEATURE_STORE_PATH = os.environ.get(
+    "FCM_FEATURE_STORE",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "feature_store.sqlite")
+)   # "" disables the store
+FEATURE_STORE_MAX_AGE = float(os.environ.get("FCM_FEATURE_STORE_MAX_AGE", 7 * 24 * 3600))   # seconds; URL features embed probe results
+
+# Replay reservoir for train_model.py, one memory-mapped .npy per column (see training_cache.py)
+TRAINING_CACHE_DIR = os.environ.get(
+    "FCM_TRAINING_CACHE",
+    os.path.join(os.path.dirname(__file__), "..", "training_cache")
+)
+
+# URLs already trained on: scalable Bloom filter replacing trained_urls.json (see bloom.py)
+TRAINED_SET_PATH = os.environ.get(
+    "FCM_TRAINED_SET",
+    os.path.join(os.path.dirname(__file__), "..", "trained_urls.bloom")
+)
+TRAINED_SET_ERROR_RATE = float(os.environ.get("FCM_TRAINED_SET_ERROR_RATE", 0.001))   # false "already trained" rate
+TRAINED_SET_CAPACITY = int(os.environ.get("FCM_TRAINED_SET_CAPACITY", 100000))       # items in the first slice
+LEGACY_TRAINED_FILE = os.path.join(os.path.dirname(__file__), "..", "trained_urls.json")
@@ -0,0 +1,56 @@
+# detection/confusables.py
+"""
+Unicode confusable skeletons (UTS #39) for homograph detection.
+
+detection/data/confusables.json is compiled from Unicode confusables.txt by
+scripts/build_confusables.py into a single translate table, so a skeleton is
+lower() + NFD + one str.translate() — no per-character Python loop and no
+per-call dict construction.
+"""
+import os
+import json
+import threading
+import unicodedata
+
+CONFUSABLES_FILE = os.path.join(os.path.dirname(__file__), "data", "confusables.json")
+
+_table = None
+_version = None
+_lock = threading.Lock()
+
+def _load():
+    global _table, _version
+    with _lock:
+        if _table is None:
+            try:
+                with open(CONFUSABLES_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                _version = data.get("version")
+                _table = {int(cp, 16): target for cp, target in data["map"].items()}
+            except Exception as e:
+                print("⚠️ Could not load confusables table:", e)
+                _table = {}
+    return _table
+
+def confusables_version():
+    _load()
+    return _version
+
+def skeleton(text: str) -> str:
+    """
+    UTS #39 skeleton of lowercased `text` (combining marks dropped). Skeletons
+    are for comparison only: 'paypal.com' and 'pаypal.com' (Cyrillic а) both
+    become 'paypaI.corn'.
+    """
+    table = _table if _table is not None else _load()
+    return unicodedata.normalize("NFD", text.lower()).translate(table)
+
+def ascii_skeleton(host: str):
+    """
+    Skeleton of a (decoded) host when it reduces to ASCII, i.e. the host is
+    built from Latin lookalikes. None for genuinely non-Latin names.
+    """
+    if not host:
+        return None
+    s = skeleton(host)
+    return s if s.isascii() else None
@@ -0,0 +1,254 @@
+# detection/dataset.py
+"""
+Append-only, partitioned store for the scored feed data (formerly schema.json).
+
+    dataset/urls/part-<time_ns>-<n>.jsonl
+    dataset/urls/part-<time_ns>-<n>.cols/index.json   ids + column -> file
+    dataset/urls/part-<time_ns>-<n>.cols/c000.json    one column of the part
+    dataset/apps/...
+    dataset/content/...
+
+Every line is one record: {"id": <key>, **entry}, where entry is what
+schema.json held under schema[bucket][key]. append() only ever adds new part
+files (written to a temp name, then renamed), so a run never rewrites what is
+already there. When an id appears more than once the newest record wins,
+the same as schema[bucket].update() used to do; compact() folds the parts
+down to one record per id.
+
+Next to each part, its .cols sidecar holds the same data column by column,
+so readers that ask for some columns (training: "threat_label" and
+"features") or only ids (ids(), count()) parse just those files and never
+touch reasons, urls or timestamps. Full records are read from the lines.
+Parts written before sidecars existed are parsed line by line. Readers go
+one part at a time, newest first.
+export_schema() writes the old schema.json layout for tools that still want
+it. A dataset directory that does not exist yet is seeded once from a legacy
+schema.json (see load_dataset()).
+"""
+import os
+import json
+import time
+import shutil
+import itertools
+
+from .config import DATASET_DIR, DATASET_PART_ROWS, LEGACY_SCHEMA_FILE
+
+BUCKETS = ("urls", "apps", "content")
+
+_part_seq = itertools.count()
+_ID_PREFIX = '{"id": '           # _write_part puts the id first on every line
+_decoder = json.JSONDecoder()
+_INDEX = "index.json"           # column sidecar: {"ids": [...], "columns": {name: file}}
+
+
+def _columns_dir(part: str) -> str:
+    """part-<...>.jsonl -> part-<...>.cols/"""
+    return part[:-len(".jsonl")] + ".cols"
+
+
+def _line_id(line: str):
+    """The record id of a part line without decoding the rest of it."""
+    if not line.startswith(_ID_PREFIX):
+        try:
+            return json.loads(line).get("id")
+        except ValueError:
+            return None
+    try:
+        return _decoder.raw_decode(line, len(_ID_PREFIX))[0]
+    except ValueError:
+        return None
+
+
+class Dataset:
+    def __init__(self, root: str = DATASET_DIR, part_rows: int = DATASET_PART_ROWS):
+        self.root = root
+        self.part_rows = max(1, part_rows)
+
+    def _bucket_dir(self, bucket: str) -> str:
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket '{bucket}'")
+        return os.path.join(self.root, bucket)
+
+    def parts(self, bucket: str) -> list:
+        """Part files of a bucket, oldest first."""
+        d = self._bucket_dir(bucket)
+        if not os.path.isdir(d):
+            return []
+        return [os.path.join(d, n) for n in sorted(os.listdir(d))
+                if n.startswith("part-") and n.endswith(".jsonl")]
+
+    def exists(self) -> bool:
+        return any(self.parts(b) for b in BUCKETS)
+
+    # --- write ---
+    def _write_part(self, bucket: str, rows: list) -> str:
+        d = self._bucket_dir(bucket)
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, f"part-{time.time_ns():020d}-{next(_part_seq):04d}.jsonl")
+        # Sidecar first: a part is only listed once its .jsonl exists, so a reader
+        # never sees a part without its sidecar (an orphaned sidecar is ignored)
+        self._write_columns(_columns_dir(path), rows)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item_id, record in rows:
+                f.write(json.dumps({"id": item_id, **record}, default=str) + "\n")
+        os.replace(tmp, path)
+        return path
+
+    def _write_columns(self, cols_dir: str, rows: list):
+        """The part's ids and every column in its own file, values in line order."""
+        columns = {}
+        for i, (_, record) in enumerate(rows):
+            for name, value in record.items():
+                if name != "id":
+                    columns.setdefault(name, ([], []))
+                    columns[name][0].append(i)
+                    columns[name][1].append(value)
+        tmp = cols_dir + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = {}
+        for n, (name, (rows_with, values)) in enumerate(columns.items()):
+            files[name] = f"c{n:03d}.json"
+            with open(os.path.join(tmp, files[name]), "w", encoding="utf-8") as f:
+                # rows is null when every line has the column
+                json.dump({"rows": None if len(rows_with) == len(rows) else rows_with,
+                           "values": values}, f, default=str)
+        with open(os.path.join(tmp, _INDEX), "w", encoding="utf-8") as f:
+            json.dump({"ids": [item_id for item_id, _ in rows], "columns": files}, f, default=str)
+        os.replace(tmp, cols_dir)
+
+    def append(self, bucket: str, records) -> int:
+        """Append (id, record) pairs as new part file(s); returns how many."""
+        count, rows = 0, []
+        for item_id, record in records:
+            rows.append((item_id, record))
+            if len(rows) >= self.part_rows:
+                self._write_part(bucket, rows)
+                count, rows = count + len(rows), []
+        if rows:
+            self._write_part(bucket, rows)
+            count += len(rows)
+        return count
+
+    def append_schema(self, schema: dict) -> dict:
+        """Append a schema.json-shaped dict; returns counts per bucket."""
+        return {b: self.append(b, schema.get(b, {}).items()) for b in BUCKETS}
+
+    # --- read ---
+    def _sidecar_rows(self, path: str, columns) -> list:
+        """_part_rows() from the part's column sidecar: only the requested column files are parsed."""
+        cols_dir = _columns_dir(path)
+        with open(os.path.join(cols_dir, _INDEX), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        ids = index["ids"]
+        if columns == ():
+            return [(item_id, None) for item_id in ids]
+        records = [{} for _ in ids]
+        for name in columns:
+            if name not in index["columns"]:
+                continue
+            with open(os.path.join(cols_dir, index["columns"][name]), "r", encoding="utf-8") as f:
+                column = json.load(f)
+            for i, value in zip(column["rows"] or range(len(ids)), column["values"]):
+                records[i][name] = value
+        return list(zip(ids, records))
+
+    def _part_rows(self, path: str, columns=None) -> list:
+        """[(id, record)] of one part file in line order; ids only (record None) when columns == ()."""
+        if columns is not None and os.path.isdir(_columns_dir(path)):
+            try:
+                return self._sidecar_rows(path, columns)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Dataset: column sidecar of {path} unreadable ({e}); parsing the part")
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if columns == ():
+                    item_id = _line_id(line)
+                    if item_id is not None:
+                        rows.append((item_id, None))
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                item_id = row.pop("id", None)
+                if item_id is None:
+                    continue
+                if columns is not None:
+                    row = {c: row[c] for c in columns if c in row}
+                rows.append((item_id, row))
+        return rows
+
+    def iter_records(self, bucket: str, columns=None):
+        """
+        (id, record) with the newest record per id, streamed one part file at a
+        time from the newest part back; only the ids already yielded are kept.
+        """
+        yielded = set()
+        for path in reversed(self.parts(bucket)):
+            for item_id, row in reversed(self._part_rows(path, columns)):
+                if item_id not in yielded:
+                    yielded.add(item_id)
+                    yield item_id, {} if row is None else row
+
+    def read(self, bucket: str, columns=None) -> dict:
+        """{id: record} with only `columns` kept (all when None); newest record per id wins."""
+        return dict(self.iter_records(bucket, columns))
+
+    def ids(self, bucket: str) -> set:
+        """Every id stored in a bucket (from the sidecars; the leading id of each line otherwise)."""
+        return {item_id for path in self.parts(bucket) for item_id, _ in self._part_rows(path, columns=())}
+
+    def count(self, bucket: str) -> int:
+        return len(self.ids(bucket))
+
+    # --- maintenance ---
+    def compact(self, bucket: str) -> int:
+        """Rewrite a bucket as parts holding only the newest record per id."""
+        old = self.parts(bucket)
+        if len(old) <= 1:
+            return self.count(bucket)
+        n = self.append(bucket, self.iter_records(bucket))
+        for path in old:
+            os.remove(path)
+            shutil.rmtree(_columns_dir(path), ignore_errors=True)
+        return n
+
+    def export_schema(self, path: str, buckets=BUCKETS) -> dict:
+        """
+        Write the legacy schema.json layout ({bucket: {id: record}}), streamed
+        record by record (newest part first); returns counts per bucket.
+        """
+        counts = {}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("{")
+            for i, bucket in enumerate(buckets):
+                f.write(("," if i else "") + f"\n  {json.dumps(bucket)}: {{")
+                n = 0
+                for item_id, record in self.iter_records(bucket):
+                    f.write(("," if n else "") + f"\n    {json.dumps(item_id)}: {json.dumps(record, default=str)}")
+                    n += 1
+                counts[bucket] = n
+                f.write("\n  }")
+            f.write("\n}\n")
+        os.replace(tmp, path)
+        return counts
+
+
+def import_schema(dataset: Dataset, path: str = LEGACY_SCHEMA_FILE) -> dict:
+    """Append the contents of a schema.json file to the dataset."""
+    with open(path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    return dataset.append_schema(schema)
+
+
+def load_dataset(root: str = DATASET_DIR) -> Dataset:
+    """The dataset at `root`, seeded once from a legacy schema.json if it has no parts yet."""
+    dataset = Dataset(root)
+    if not dataset.exists() and os.path.exists(LEGACY_SCHEMA_FILE):
+        counts = import_schema(dataset)
+        print(f"✅ Imported legacy schema.json into {root}: {counts}")
+    return dataset
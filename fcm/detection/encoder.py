@@ -0,0 +1,98 @@
+# detection/encoder.py
+"""
+Feature dict -> float32 matrix encoding shared by training (scripts/train_model.py)
+and inference (engine.apply_ml_score).
+
+Columns follow feature_columns.json order. Every column has a fixed kind:
+  - hashed: strings and lists are mapped to a stable bucket (crc32 % 1000),
+    identical across processes and between training and inference
+  - numeric: bools -> 0/1, numbers as-is, anything else -> 0
+NaN/inf become 0 and values are clipped to +/-1e10, as training always did.
+"""
+import os
+import json
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+FEATURES_PATH = os.path.join(ROOT_DIR, "feature_columns.json")
+
+HASH_BUCKETS = 1000
+CLIP = 1e10
+
+# Columns whose values are categorical strings or keyword lists
+HASHED_COLUMNS = {"ext", "tld", "scheme", "platform", "word_hits", "scam_hits"}
+
+def load_feature_columns(path: str = FEATURES_PATH) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=65536)
+def stable_hash(text: str) -> int:
+    """Process-independent replacement for hash(text) % 1000."""
+    return zlib.crc32(text.encode("utf-8")) % HASH_BUCKETS
+
+def _hashed(val) -> float:
+    if val is None:
+        return 0.0
+    if isinstance(val, (list, tuple)):
+        # collapse lists -> string -> hashed number
+        val = "_".join([str(v) for v in val])
+    elif isinstance(val, bool):
+        return float(val)
+    elif isinstance(val, (int, float)):
+        return float(val)
+    elif isinstance(val, dict):
+        return 0.0
+    return float(stable_hash(str(val)))
+
+def _numeric(val) -> float:
+    t = type(val)
+    if t is int or t is float or t is bool:
+        return float(val)
+    if val is None or isinstance(val, (dict, list, tuple, str)):
+        return 0.0
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return 0.0
+
+def column_kinds(columns) -> list:
+    return [_hashed if c in HASHED_COLUMNS else _numeric for c in columns]
+
+def _finish(X):
+    np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    np.clip(X, -CLIP, CLIP, out=X)
+    return X
+
+def encode_row(features: dict, columns, out=None):
+    """Encode one feature dict into a (1, n_columns) float32 array (or into `out`)."""
+    if out is None:
+        out = np.empty((1, len(columns)), dtype=np.float32)
+    row = out.reshape(-1)
+    get = features.get
+    for j, col in enumerate(columns):
+        val = get(col, 0)
+        row[j] = _hashed(val) if col in HASHED_COLUMNS else _numeric(val)
+    return _finish(out)
+
+def encode_batch(features_list, columns):
+    """Encode many feature dicts column by column into a preallocated float32 matrix."""
+    n = len(features_list)
+    X = np.empty((n, len(columns)), dtype=np.float32)
+    for j, (col, conv) in enumerate(zip(columns, column_kinds(columns))):
+        X[:, j] = np.fromiter((conv(f.get(col, 0)) for f in features_list), dtype=np.float32, count=n)
+    return _finish(X)
+
+def feature_columns_from(features_list) -> list:
+    """Columns for a fresh training run: every scalar/list feature, in first-seen order."""
+    seen = {}
+    for f in features_list:
+        for k, v in f.items():
+            if k not in seen and not isinstance(v, dict):
+                seen[k] = None
+    return list(seen)
@@ -4,65 +4,59 @@ from detection.rules import score_from_reasons, status_from_score
 from .features_url import extract_url_features, is_valid_url
 from .features_app import extract_app_features
 from .features_content import extract_content_features
+from .probe import probe_url, probe_url_async, probe_many, timed_out_probe, offline_probe, url_exists
+from .reputation import LEGIT_INDEX, load_legit_domains
+from .parsed_url import parse_url
+from .feature_store import url_entries, app_features, content_features
+from .config import MAX_INFLIGHT_PROBES, MAX_QUEUED_PROBES, REQUEST_DEADLINE, PROBE_WORKERS
 import os
-import numpy as np
-import xgboost as xgb
-import json
-import requests
-import tldextract
-from urllib.parse import urlparse
-
-# --- Load ML model ---
+import asyncio
+import hashlib
+import threading
+
+# --- ML model (native Booster, see inference.py; loaded on first use, numpy/xgboost only imported then) ---
 ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
 MODEL_PATH = os.path.join(ROOT_DIR, "xgboost_model.json")
 FEATURES_PATH = os.path.join(ROOT_DIR, "feature_columns.json")
 
 ml_model = None
 TRAINED_FEATURES = []
-
-if os.path.exists(MODEL_PATH):
-    ml_model = xgb.XGBClassifier()
-    ml_model.load_model(MODEL_PATH)
-    if os.path.exists(FEATURES_PATH):
-        with open(FEATURES_PATH, "r") as f:
-            TRAINED_FEATURES = json.load(f)
-    else:
-        try:
-            TRAINED_FEATURES = ml_model.get_booster().feature_names
-        except Exception:
-            TRAINED_FEATURES = []
-else:
-    print("⚠️ ML model not found. Only rule-based scoring will be used.")
-
-# --- Load legit domains (normalized to registrable domain: domain.tld) ---
-LEGIT_FILE = os.path.join(ROOT_DIR, "data", "leg.txt")
-
-def load_legit_domains(path):
-    s = set()
-    try:
-        with open(path, "r", encoding="utf-8") as fh:
-            for line in fh:
-                line = line.strip().lower()
-                if not line:
-                    continue
-                # strip scheme if present and take hostname
-                try:
-                    p = urlparse(line if line.startswith(("http://","https://")) else "http://" + line)
-                    host = (p.hostname or line).lower()
-                except Exception:
-                    host = line
-                if host.startswith("www."):
-                    host = host[4:]
-                ext = tldextract.extract(host)
-                if ext.domain and ext.suffix:
-                    s.add(f"{ext.domain}.{ext.suffix}")
-                else:
-                    s.add(host)
-    except Exception as e:
-        print("Could not load legit domains from", path, ":", e)
-    return s
-
-LEGIT_DOMAINS = load_legit_domains(LEGIT_FILE)
+MODEL_VERSION = "none"     # content hash of model + feature columns, set by load_model()
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def load_model():
+    """Load the XGBoost model and its feature list once; returns the model or None."""
+    global ml_model, TRAINED_FEATURES, MODEL_VERSION, _model_loaded
+    if _model_loaded:
+        return ml_model
+    with _model_lock:
+        if _model_loaded:
+            return ml_model
+        if os.path.exists(MODEL_PATH):
+            from .encoder import load_feature_columns
+            from .inference import load_booster
+            model = load_booster(MODEL_PATH)
+            if os.path.exists(FEATURES_PATH):
+                TRAINED_FEATURES = load_feature_columns(FEATURES_PATH)
+            else:
+                TRAINED_FEATURES = model.feature_names or []
+            ml_model = model
+            digest = hashlib.sha1()
+            for path in (MODEL_PATH, FEATURES_PATH):
+                if os.path.exists(path):
+                    with open(path, "rb") as fh:
+                        digest.update(fh.read())
+            MODEL_VERSION = digest.hexdigest()[:12]
+        else:
+            print("⚠️ ML model not found. Only rule-based scoring will be used.")
+        _model_loaded = True
+    return ml_model
+
+def model_version() -> str:
+    """Identifies the loaded model ("none" when scoring is rule-based only)."""
+    load_model()
+    return MODEL_VERSION
 
 # --- Helpers ---
 def apply_sector_boost(reasons, sector):
@@ -78,37 +72,42 @@ def apply_ml_score(features, reasons):
       "ML probability: 0.42" with points = int(prob*100)
     (We no longer append "ML model flagged as suspicious".)
     """
-    if ml_model is None or not TRAINED_FEATURES:
-        return reasons
-
-    X_vec = []
-    for f_name in TRAINED_FEATURES:
-        val = features.get(f_name, 0)
-        if isinstance(val, list):
-            # collapse lists -> string -> hashed number
-            val = "_".join([str(v) for v in val])
-            val = hash(val) % 1000
-        elif isinstance(val, str):
-            val = hash(val) % 1000
-        elif isinstance(val, bool):
-            val = int(val)
-        elif isinstance(val, dict):
-            # don't attempt to serialize large dicts — use fallback 0
-            val = 0
-        elif val is None:
-            val = 0
-        X_vec.append(val)
-
-    X_vec = np.array([X_vec])
+    return apply_ml_scores([features], [reasons])[0]
+
+def apply_ml_scores(features_list, reasons_list):
+    """
+    Batch form of apply_ml_score: one in-place Booster prediction over the
+    stacked feature rows, then one ML entry appended to each reasons list.
+    """
+    if not features_list or load_model() is None or not TRAINED_FEATURES:
+        return reasons_list
+    from .encoder import encode_row, encode_batch
+
+    if len(features_list) == 1:
+        X = encode_row(features_list[0], TRAINED_FEATURES)
+    else:
+        X = encode_batch(features_list, TRAINED_FEATURES)
     try:
-        ml_prob = float(ml_model.predict_proba(X_vec)[0][1])
-        ml_points = int(ml_prob * 100)
-        reasons.append({"reason": f"ML probability: {ml_prob:.2f}", "points": ml_points})
+        probs = ml_model.predict_positive(X)
     except Exception as e:
         print("⚠️ ML model scoring failed:", e)
-        reasons.append({"reason": "ML scoring failed", "points": 0})
+        for reasons in reasons_list:
+            reasons.append({"reason": "ML scoring failed", "points": 0})
+        return reasons_list
 
-    return reasons
+    for reasons, prob in zip(reasons_list, probs):
+        ml_prob = float(prob)
+        ml_points = int(ml_prob * 100)
+        reasons.append({"reason": f"ML probability: {ml_prob:.2f}", "points": ml_points})
+    return reasons_list
+
+def _per_item(value, n):
+    """Broadcast a scalar batch argument (sector/platform) to n items."""
+    if isinstance(value, (list, tuple)):
+        if len(value) != n:
+            raise ValueError(f"expected {n} values, got {len(value)}")
+        return list(value)
+    return [value] * n
 
 # ------- ports / reachability ----------------
 def check_uncommon_port(parsed) -> bool:
@@ -116,50 +115,19 @@ def check_uncommon_port(parsed) -> bool:
         return False
     return parsed.port not in (80, 443)
 
-#import requests
-
-def url_exists(u: str, timeout: int = 5) -> bool:
-    """Check if a URL is reachable (try HEAD first, then GET fallback)."""
-    try:
-        # Ensure scheme
-        url_to_check = u if u.startswith(("http://", "https://")) else "http://" + u
-        
-        # First try HEAD
-        try:
-            resp = requests.head(url_to_check, allow_redirects=True, timeout=timeout)
-            if 200 <= resp.status_code < 400:
-                return True
-        except requests.RequestException:
-            pass
-        
-        # Fallback to GET if HEAD fails
-        resp = requests.get(url_to_check, allow_redirects=True, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-        return 200 <= resp.status_code < 400
-    
-    except Exception:
-        return False
-
-
-def get_registrable_domain(u: str) -> str:
-    """Return domain.tld for the passed URL/host (normalized, lower)."""
-    try:
-        p = urlparse(u if u.startswith(("http://","https://")) else "http://" + u)
-        host = (p.hostname or "").lower()
-        if host.startswith("www."):
-            host = host[4:]
-        ext = tldextract.extract(host)
-        if ext.domain and ext.suffix:
-            return f"{ext.domain}.{ext.suffix}"
-        return host
-    except Exception:
-        return ""
+def get_registrable_domain(u) -> str:
+    """Return domain.tld for the passed URL/host/ParsedURL (normalized, lower)."""
+    pu = parse_url(u)
+    return pu.registrable or pu.host_nowww
 
 # ---------- URL scoring ----------
-def score_input(u: str, sector="general") -> dict:
-    if not is_valid_url(u):
+def score_input(u, sector="general") -> dict:
+    # Parsed once here; the same ParsedURL goes to validation, probing, features and rules
+    pu = parse_url(u)
+    if not is_valid_url(pu):
         return {
             "type": "unknown",
-            "input": u,
+            "input": pu.raw,
             "sector": sector,
             "features": {},
             "reasons": [{"reason": "Input is not a valid URL", "points": 50}],
@@ -167,26 +135,31 @@ def score_input(u: str, sector="general") -> dict:
             "status": "High Risk",
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
-    return score_url(u, sector)
+    return score_url(pu, sector)
 
-def score_url(u: str, sector="general") -> dict:
-    f = extract_url_features(u)
+def score_url(u, sector="general", probe=None, features=None) -> dict:
+    """
+    u: URL string or ParsedURL.
+    probe: pre-fetched probe.probe_url(u) result (score_urls passes one in).
+    features: extract_url_features(u, probe=probe), when already known (feature store).
+    """
+    pu = parse_url(u)
+    u = pu.raw
+    # One streamed fetch gives TLS, redirect and reachability results (per-URL deadline)
+    if probe is None:
+        probe = probe_url(pu)
+    # A probe cut off by its deadline says nothing about TLS/reachability: partial result.
+    # A skipped probe (score_url_lexical) means the network checks have not run yet.
+    timed_out = bool(probe.get("timed_out"))
+    offline = bool(probe.get("skipped"))
+    f = extract_url_features(pu, probe=probe) if features is None else features
     reasons = []
 
     # Normalize host for legit check
-    host = f.get("host", "").lower().strip()
-    if host.startswith("www."):
-        host = host[4:]
-
-    # --- LOAD LEGIT LIST ---
-    legit_domains = []
-    legit_file = os.path.join(ROOT_DIR, "legit.txt")
-    if os.path.exists(legit_file):
-        with open(legit_file, "r") as lf:
-            legit_domains = [line.strip().lower() for line in lf if line.strip()]
-
-    # --- LEGIT EXACT MATCH ---
-    is_legit = host in legit_domains
+    host = pu.host_nowww
+
+    # --- LEGIT EXACT MATCH (legit.txt, hot-reloaded index) ---
+    is_legit = LEGIT_INDEX.has_host(host)
     if is_legit:
         reasons.append({"reason": "Domain marked as legit", "points": -30})
 
@@ -199,14 +172,12 @@ def score_url(u: str, sector="general") -> dict:
     # --- 3️⃣ PUNYCODE / HOMOGRAPH ---
     if "punycode" in f:
         p = f["punycode"]
-        if p.get("is_punycode", False):
-            reason_text = "Suspicious Punycode host"
-            if p.get("contains_homoglyphs", False):
-                reason_text += " with homoglyphs"
-                points = p.get("punycode_severity", 20)
-            else:
-                points = p.get("punycode_severity", 15)
-            reasons.append({"reason": reason_text, "points": points})
+        # An IDN on its own is not suspicious; lookalikes with no target get a small weight
+        if p.get("is_punycode", False) and (p.get("imitates") or p.get("contains_homoglyphs", False)):
+            reasons.append({"reason": "Suspicious Punycode host with homoglyphs",
+                            "points": p.get("punycode_severity", 10)})
+            if p.get("imitates"):
+                reasons.append({"reason": f"Homograph of '{p['imitates']}'", "points": 40})
 
     # --- 4️⃣ BRAND SIMILARITY ---
     # Always run brand similarity even if domain is legit
@@ -233,7 +204,7 @@ def score_url(u: str, sector="general") -> dict:
         reasons.append({"reason": f"Domain fairly new ({age} days)", "points": 15})
 
     # --- 7️⃣ SSL CHECK ---
-    if f.get("scheme") == "https" and not f.get("ssl_valid", 1):
+    if f.get("scheme") == "https" and not f.get("ssl_valid", 1) and not (timed_out or offline):
         reasons.append({"reason": "HTTPS but invalid/expired SSL", "points": 15})
 
     # --- 8️⃣ MEDIUM SEVERITY CHECKS ---
@@ -277,14 +248,18 @@ def score_url(u: str, sector="general") -> dict:
     reasons = apply_sector_boost(reasons, sector)
 
     # --- 13️⃣ URL REACHABILITY (LAST STEP) ---
-    if not url_exists(u):
+    if offline:
+        reasons.append({"reason": "Network checks pending", "points": 0})
+    elif timed_out:
+        reasons.append({"reason": "Network probes timed out", "points": 0})
+    elif not probe["reachable"]:
         reasons.append({"reason": "URL not reachable", "points": 40})
 
     # --- 14️⃣ FINAL SCORE ---
     score = score_from_reasons(reasons)
     status = status_from_score(score)
 
-    return {
+    result = {
         "type": "url",
         "url": u,
         "sector": sector,
@@ -294,11 +269,119 @@ def score_url(u: str, sector="general") -> dict:
         "status": status,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
+    if offline:
+        result["provisional"] = True
+    elif timed_out:
+        result["partial"] = True
+    return result
+
+def score_url_lexical(u, sector="general") -> dict:
+    """
+    score_url from the URL string alone (host, port, punycode, brands, TLD,
+    hyphens, digits, length): no probe, so it returns in well under a
+    millisecond once warm. Marked "provisional": true.
+    """
+    pu = parse_url(u)
+    return score_url(pu, sector, probe=offline_probe(pu))
+
+
+def score_urls(urls, sector="general", store=None, concurrency: int = PROBE_WORKERS) -> list:
+    """
+    Score many URLs. Hosts are probed concurrently (one fetch per cache key,
+    see probe.probe_many); results match score_url item for item.
+    sector: one value for all URLs or a list aligned with `urls`.
+    store: a feature_store.FeatureStore; URLs it holds are scored from their
+    stored probe and features without touching the network.
+    concurrency: probes in flight for this call. All calls share the
+    PROBE_WORKERS probe threads and a probe's deadline includes waiting for
+    one, so callers scoring batches in parallel pass PROBE_WORKERS // workers.
+    """
+    urls = [parse_url(u) for u in urls]
+    sectors = _per_item(sector, len(urls))
+    if store is not None:
+        entries = url_entries(urls, store, concurrency=concurrency)
+        return [score_url(u, s, probe=e["probe"], features=e["features"])
+                for u, s, e in zip(urls, sectors, entries)]
+    probes = probe_many(urls, concurrency=concurrency)
+    return [score_url(u, s, probe=p) for u, s, p in zip(urls, sectors, probes)]
+
+
+# ---------- Async URL scoring (server.py) ----------
+class Overloaded(Exception):
+    """Too many requests already waiting for a probe slot (the API answers 503)."""
+
+
+class ProbeLimiter:
+    """
+    Bounds probes in flight across all concurrent requests. A slot is held
+    until the probe thread finishes, including fetches abandoned at their
+    deadline. Callers wait for a slot up to their own deadline; once
+    max_queued callers are already waiting, new ones are rejected straight
+    away instead of piling up.
+    """
+
+    def __init__(self, max_inflight: int = MAX_INFLIGHT_PROBES, max_queued: int = MAX_QUEUED_PROBES):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queued = max(0, max_queued)
+        self._sem = None        # created inside the serving event loop on first use
+        self.inflight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        """True once a slot is held; False if none freed up within `timeout`."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        if not self._sem.locked():
+            await self._sem.acquire()    # free slot: taken without suspending
+            self.inflight += 1
+            return True
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded(f"{self.waiting} requests already waiting for a probe slot")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=max(0.0, timeout))
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        return True
+
+    def release(self):
+        self.inflight -= 1
+        self._sem.release()
+
+    def stats(self) -> dict:
+        return {"inflight": self.inflight, "waiting": self.waiting, "rejected": self.rejected,
+                "max_inflight": self.max_inflight, "max_queued": self.max_queued}
+
+
+async def score_url_async(u, sector="general", deadline: float = REQUEST_DEADLINE, limiter: ProbeLimiter = None) -> dict:
+    """
+    score_url without blocking the event loop. Waiting for a probe slot and the
+    probe itself share one `deadline`; past it the result is scored without
+    network data and marked partial ("Network probes timed out").
+    Raises Overloaded when the limiter's queue is full.
+    """
+    pu = parse_url(u)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    if limiter is None:
+        probe = await probe_url_async(pu, deadline=deadline)
+    elif await limiter.acquire(deadline):
+        # The slot is freed when the fetch thread finishes, not when we stop waiting
+        # for it: an abandoned fetch still occupies a probe thread
+        probe = await probe_url_async(pu, deadline=max(0.0, end - loop.time()), on_done=limiter.release)
+    else:
+        probe = timed_out_probe(pu)
+    return score_url(pu, sector, probe=probe)
 
 
 # ---------- APP & CONTENT scoring (unchanged logic but kept here for completeness) ----------
-def score_app(u: str, platform="android", sector="general") -> dict:
-    f = extract_app_features(u, platform=platform)
+def app_rule_reasons(f: dict, platform="android", sector="general") -> list:
+    """Rule-based reasons for app features (everything except the ML entry)."""
     reasons = []
 
     if f.get("direct_apk"):
@@ -331,9 +414,9 @@ def score_app(u: str, platform="android", sector="general") -> dict:
     if f.get("is_official_store", False) and not reasons:
         reasons.append({"reason": "Official store link (safe)", "points": -15})
 
-    reasons = apply_sector_boost(reasons, sector)
-    reasons = apply_ml_score(f, reasons)
+    return apply_sector_boost(reasons, sector)
 
+def _app_result(u, platform, sector, f, reasons) -> dict:
     score = score_from_reasons(reasons)
     return {
         "type": "app",
@@ -347,8 +430,27 @@ def score_app(u: str, platform="android", sector="general") -> dict:
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
-def score_content(u: str, sector="general") -> dict:
-    f = extract_content_features(u)
+def score_app(u: str, platform="android", sector="general") -> dict:
+    f = extract_app_features(u, platform=platform)
+    reasons = app_rule_reasons(f, platform, sector)
+    reasons = apply_ml_score(f, reasons)
+    return _app_result(u, platform, sector, f, reasons)
+
+def score_apps(urls, platform="android", sector="general", store=None) -> list:
+    """Score many app links with a single ML call; platform/sector may be lists."""
+    urls = list(urls)
+    platforms = _per_item(platform, len(urls))
+    sectors = _per_item(sector, len(urls))
+    if store is not None:
+        feats = app_features(urls, platforms, store)
+    else:
+        feats = [extract_app_features(u, platform=p) for u, p in zip(urls, platforms)]
+    reasons = [app_rule_reasons(f, p, s) for f, p, s in zip(feats, platforms, sectors)]
+    reasons = apply_ml_scores(feats, reasons)
+    return [_app_result(*row) for row in zip(urls, platforms, sectors, feats, reasons)]
+
+def content_rule_reasons(f: dict, sector="general") -> list:
+    """Rule-based reasons for content features (everything except the ML entry)."""
     reasons = []
 
     if f.get("is_dangerous"):
@@ -373,9 +475,9 @@ def score_content(u: str, sector="general") -> dict:
     if (f.get("is_known_doc") or f.get("is_image")) and not reasons:
         reasons.append({"reason": "Known doc/image type", "points": -10})
 
-    reasons = apply_sector_boost(reasons, sector)
-    reasons = apply_ml_score(f, reasons)
+    return apply_sector_boost(reasons, sector)
 
+def _content_result(u, sector, f, reasons) -> dict:
     score = score_from_reasons(reasons)
     status = status_from_score(score)
 
@@ -389,3 +491,18 @@ def score_content(u: str, sector="general") -> dict:
         "status": status,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
+
+def score_content(u: str, sector="general") -> dict:
+    f = extract_content_features(u)
+    reasons = content_rule_reasons(f, sector)
+    reasons = apply_ml_score(f, reasons)
+    return _content_result(u, sector, f, reasons)
+
+def score_contents(urls, sector="general", store=None) -> list:
+    """Score many content links with a single ML call; sector may be a list."""
+    urls = list(urls)
+    sectors = _per_item(sector, len(urls))
+    feats = content_features(urls, store) if store is not None else [extract_content_features(u) for u in urls]
+    reasons = [content_rule_reasons(f, s) for f, s in zip(feats, sectors)]
+    reasons = apply_ml_scores(feats, reasons)
+    return [_content_result(*row) for row in zip(urls, sectors, feats, reasons)]
@@ -0,0 +1,258 @@
+# detection/feature_store.py
+"""
+Local feature store: extracted features keyed by (kind, normalized URL) and
+tagged with the extractor version that produced them.
+
+A kind's version hashes the extractor module's FEATURES_VERSION, the source
+of the extractor and of every detection module that shapes its features
+(EXTRACTOR_DEPS: parsing, TLDs, keywords, confusables, brands, probes), the
+rule data extractors read (brands, keyword lists, confusables) and, for
+URLs, the legit-domain index behind is_legit. Bumping FEATURES_VERSION,
+editing any of those modules or changing that data makes the existing
+entries of that kind stale: they count as misses, are recomputed and
+overwritten, and prune() deletes whatever is left.
+
+URL entries also keep the probe their features came from, so score_url can
+be replayed without the network. They expire after FEATURE_STORE_MAX_AGE,
+and features from a timed-out probe are never stored. Values are
+zlib-compressed JSON in a sqlite BLOB column.
+"""
+import os
+import copy
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+
+from .config import FEATURE_STORE_PATH, FEATURE_STORE_MAX_AGE, PROBE_WORKERS
+from .parsed_url import parse_url, normalize_input
+from .probe import probe_many
+from .reputation import LEGIT_INDEX
+from .brands import BRANDS_FILE
+from .keywords import get_matcher
+from .confusables import confusables_version
+from . import features_url, features_app, features_content
+from . import parsed_url, tld, keywords, confusables, brands, probe, reputation
+
+EXTRACTORS = {"url": features_url, "app": features_app, "content": features_content}
+# Modules whose code changes a kind's features besides the extractor itself (keep in
+# step with the extractors' imports)
+EXTRACTOR_DEPS = {
+    "url": (parsed_url, tld, keywords, confusables, brands, probe, reputation),
+    "app": (tld, keywords),
+    "content": (keywords,),
+}
+
+
+# --- Versions ---
+@lru_cache(maxsize=1)
+def data_version() -> str:
+    """Hash of the static rule data (brands, keyword lists, confusables table)."""
+    digest = hashlib.sha1()
+    try:
+        with open(BRANDS_FILE, "rb") as fh:
+            digest.update(fh.read())
+    except OSError:
+        pass
+    digest.update(repr(sorted(get_matcher().groups.items())).encode("utf-8"))
+    digest.update(str(confusables_version()).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+@lru_cache(maxsize=None)
+def _extractor_digest(kind: str) -> str:
+    module = EXTRACTORS[kind]
+    digest = hashlib.sha1(str(module.FEATURES_VERSION).encode("utf-8"))
+    for source in (module, *EXTRACTOR_DEPS[kind]):
+        with open(source.__file__, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:12]
+
+def extractor_version(kind: str) -> str:
+    version = f"{_extractor_digest(kind)}.{data_version()}"
+    if kind == "url":
+        version += f".{LEGIT_INDEX.version}"
+    return version
+
+
+# --- Store ---
+class FeatureStore:
+    def __init__(self, path=FEATURE_STORE_PATH, max_age=FEATURE_STORE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._db = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+
+    def _conn(self):
+        """Open the sqlite file on first use (None when the store is disabled)."""
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS features ("
+                    " kind TEXT, key TEXT, version TEXT, stored REAL, value BLOB,"
+                    " PRIMARY KEY (kind, key))"
+                )
+                self._db.commit()
+            except Exception as e:
+                print("⚠️ Feature store disabled:", e)
+                self.path = None
+                self._db = None
+        return self._db
+
+    @staticmethod
+    def key(u, platform: str = None) -> str:
+        """Normalized URL (see parsed_url.normalize_input), plus the platform for apps."""
+        norm = normalize_input(parse_url(u).raw)
+        return f"{norm}#{platform}" if platform else norm
+
+    def _expired(self, kind: str, stored: float) -> bool:
+        return kind == "url" and self.max_age > 0 and stored < time.time() - self.max_age
+
+    def get_many(self, kind: str, keys) -> dict:
+        """{key: value} for keys holding a current, unexpired entry."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                self.misses += len(keys)
+                return found
+            version = extractor_version(kind)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = db.execute(
+                    f"SELECT key, version, stored, value FROM features"
+                    f" WHERE kind = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [kind, *chunk],
+                ).fetchall()
+                for key, row_version, stored, value in rows:
+                    if row_version != version or self._expired(kind, stored):
+                        self.stale += 1
+                        continue
+                    found[key] = json.loads(zlib.decompress(value))
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, kind: str, items):
+        """Store [(key, value)] under the current extractor version."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return
+            version, now = extractor_version(kind), time.time()
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO features (kind, key, version, stored, value) VALUES (?, ?, ?, ?, ?)",
+                    [(kind, key, version, now, zlib.compress(json.dumps(value, default=str).encode("utf-8")))
+                     for key, value in items],
+                )
+                db.commit()
+                self.writes += len(items)
+            except Exception as e:
+                print("⚠️ Feature store write failed:", e)
+
+    def prune(self) -> int:
+        """Delete entries written by other extractor versions or past max_age; returns how many."""
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return 0
+            deleted = 0
+            for kind in EXTRACTORS:
+                deleted += db.execute("DELETE FROM features WHERE kind = ? AND version != ?",
+                                      (kind, extractor_version(kind))).rowcount
+            if self.max_age > 0:
+                deleted += db.execute("DELETE FROM features WHERE kind = 'url' AND stored < ?",
+                                      (time.time() - self.max_age,)).rowcount
+            db.commit()
+            return deleted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "writes": self.writes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+FEATURE_STORE = FeatureStore()
+
+
+# --- Extraction through the store ---
+def _aligned(found: dict, keys: list) -> list:
+    """found[key] per key; repeated keys get their own copy."""
+    out, seen = [], set()
+    for key in keys:
+        out.append(copy.deepcopy(found[key]) if key in seen else found[key])
+        seen.add(key)
+    return out
+
+def url_entries(urls, store: FeatureStore = FEATURE_STORE, concurrency: int = PROBE_WORKERS) -> list:
+    """
+    {"features", "probe"} per URL. Only URLs without a current entry are
+    probed (concurrently, probe.probe_many, at most `concurrency` at once)
+    and extracted.
+    """
+    keys = [store.key(u) for u in urls]
+    found = store.get_many("url", keys)
+    missing = list(dict.fromkeys(k for k in keys if k not in found))
+    if missing:
+        parsed = [parse_url(k) for k in missing]
+        fresh = []
+        for key, pu, probe in zip(missing, parsed, probe_many(parsed, concurrency=concurrency)):
+            entry = {"features": features_url.extract_url_features(pu, probe=probe), "probe": probe}
+            found[key] = entry
+            if not (probe.get("timed_out") or probe.get("skipped")):
+                fresh.append((key, entry))
+        store.put_many("url", fresh)
+    return _aligned(found, keys)
+
+def app_features(urls, platforms, store: FeatureStore = FEATURE_STORE) -> list:
+    keys = [store.key(u, platform=p) for u, p in zip(urls, platforms)]
+    found = store.get_many("app", keys)
+    fresh = []
+    for key, u, p in zip(keys, urls, platforms):
+        if key not in found:
+            found[key] = features_app.extract_app_features(normalize_input(u), platform=p)
+            fresh.append((key, found[key]))
+    store.put_many("app", fresh)
+    return _aligned(found, keys)
+
+def content_features(urls, store: FeatureStore = FEATURE_STORE) -> list:
+    keys = [store.key(u) for u in urls]
+    found = store.get_many("content", keys)
+    fresh = []
+    for key, u in zip(keys, urls):
+        if key not in found:
+            found[key] = features_content.extract_content_features(normalize_input(u))
+            fresh.append((key, found[key]))
+    store.put_many("content", fresh)
+    return _aligned(found, keys)
+
+def extract_features(kind: str, urls, platform="android", store: FeatureStore = FEATURE_STORE) -> list:
+    """Features per URL for kind "url", "app" or "content", computing only what the store lacks."""
+    urls = list(urls)
+    if kind == "url":
+        return [e["features"] for e in url_entries(urls, store)]
+    if kind == "app":
+        platforms = platform if isinstance(platform, (list, tuple)) else [platform] * len(urls)
+        return app_features(urls, platforms, store)
+    if kind == "content":
+        return content_features(urls, store)
+    raise ValueError(f"Unknown feature kind '{kind}'")
@@ -1,39 +1,33 @@
 import re
-import tldextract
 from urllib.parse import urlparse
+from .tld import extract as tld_extract
+from .keywords import keyword_hits
 
-OFFICIAL_STORES = [
-    "play.google.com",
-    "apps.apple.com",
-    "microsoft.com/store"
-]
+# Bump when the extracted features change meaning (invalidates feature_store entries)
+FEATURES_VERSION = 1
 
-SCAM_KEYWORDS = [
-    "mod", "crack", "hack", "unlimited", "freecoins",
-    "premiumfree", "apkdownload", "patch", "serial",
-    "nulled", "keygen", "proversion"
-]
-
-URL_SHORTENERS = [
-    "bit.ly", "tinyurl", "t.co", "goo.gl", "is.gd", "shorte.st", "ow.ly"
-]
+# Keyword groups (detection/data/keywords/<group>.txt)
+OFFICIAL_STORES = "official_stores"
+SCAM_KEYWORDS = "scam_keywords"
+URL_SHORTENERS = "url_shorteners"
 
 def extract_app_features(u: str, platform="android") -> dict:
     low_u = u.lower()
+    hits = keyword_hits(u)
     parsed = urlparse(u)
     host = parsed.hostname or ""
-    ext = tldextract.extract(u)
+    ext = tld_extract(u)
 
     # Core features
     features = {
         "platform": platform,
-        "is_official_store": any(store in low_u for store in OFFICIAL_STORES),
+        "is_official_store": OFFICIAL_STORES in hits,
         "direct_apk": low_u.endswith(".apk"),
         "direct_ipa": low_u.endswith(".ipa"),
-        "scam_hits": [w for w in SCAM_KEYWORDS if w in low_u],
+        "scam_hits": list(hits.get(SCAM_KEYWORDS, ())),
         "length": len(u),
         "contains_id_param": "id=" in low_u,
-        "shortened": any(s in low_u for s in URL_SHORTENERS),
+        "shortened": URL_SHORTENERS in hits,
         "https": u.startswith("https://"),
         "subdomain_depth": host.count("."),
         "hyphens_in_domain": host.count("-"),
@@ -1,17 +1,17 @@
 import os
 import re
+from .keywords import keyword_hits
+
+# Bump when the extracted features change meaning (invalidates feature_store entries)
+FEATURES_VERSION = 1
 
 # Dangerous / suspicious extensions
 DANGEROUS_EXTENSIONS = {"exe", "bat", "cmd", "sh", "js", "vbs", "scr", "jar", "ps1", "apk", "com"}
 SAFE_DOCS = {"pdf", "doc", "docx", "xls", "xlsx", "ppt", "pptx", "txt", "rtf"}
 SAFE_IMAGES = {"jpg", "jpeg", "png", "gif", "bmp", "svg", "webp"}
 
-# Bait words
-BAIT_WORDS = [
-    "invoice", "payment", "ticket", "statement", "lottery",
-    "win", "prize", "bonus", "gift", "refund", "urgent",
-    "secure", "confirm", "verify", "unlock"
-]
+# Bait words (keyword group, detection/data/keywords/bait_words.txt)
+BAIT_WORDS = "bait_words"
 
 def extract_content_features(u: str) -> dict:
     low_u = u.lower()
@@ -26,7 +26,7 @@ def extract_content_features(u: str) -> dict:
         "is_known_doc": ext in SAFE_DOCS,
         "is_image": ext in SAFE_IMAGES,
         "recognized_ext": bool(ext),
-        "has_bait_words": any(w in low_u for w in BAIT_WORDS),
+        "has_bait_words": BAIT_WORDS in keyword_hits(u),
         "very_long_query": len(query) > 150,
         "filename_length": len(filename),
         "contains_double_ext": bool(ext and "." in filename.replace(f".{ext}", "")),
@@ -1,77 +1,38 @@
 # detection/features_url.py
-import os
-import re
-import ssl
-import socket
-import requests
 import idna
-import tldextract
 from datetime import datetime
-from urllib.parse import urlparse
-from Levenshtein import distance as levenshtein
+from .probe import probe_url, get_ssl_validity, count_redirects
+from .reputation import LEGIT_INDEX, normalize_domain
+from .tld import extract as tld_extract, valid_tlds
+from .brands import get_brand_index, NO_MATCH_SCORE
+from .confusables import ascii_skeleton, skeleton
+from .keywords import keyword_hits
+from .parsed_url import ParsedURL, parse_url
 
 # ----- Config / lists -----
 SUSPICIOUS_TLDS = {"tk", "ml", "ga", "cf", "gq", "top", "xyz", "buzz"}
-SUSPICIOUS_WORDS = [
-    "login", "signin", "verify", "win", "password", "update", "bank", "account",
-    "secure", "confirm", "banking", "webscr", "paypal", "free", "bonus", "gift",
-    "prize", "lottery", "credit"
-]
-BRAND_KEYWORDS = ["paypal", "google", "microsoft", "apple", "amazon", "facebook"]
-
-# ----- Helper: normalize and load whitelist (leg.txt) ----- 
-MODULE_DIR = os.path.dirname(__file__)
-LEG_FILE = os.path.normpath(os.path.join(MODULE_DIR, "..", "data", "leg.txt"))
-
-def normalize_domain(domain: str) -> str:
-    """Return registrable domain (domain.suffix) or empty string."""
-    if not domain:
-        return ""
-    domain = domain.strip().lower()
-    # strip scheme and trailing slash and possible credentials
-    if domain.startswith("http://"):
-        domain = domain[7:]
-    elif domain.startswith("https://"):
-        domain = domain[8:]
-    domain = domain.split("/")[0]
-    if domain.startswith("www."):
-        domain = domain[4:]
-    try:
-        ext = tldextract.extract(domain)
-        if ext.domain and ext.suffix:
-            return f"{ext.domain}.{ext.suffix}"
-    except Exception:
-        pass
-    return domain
+SUSPICIOUS_WORDS = "suspicious_words"   # keyword group, detection/data/keywords/suspicious_words.txt
 
-try:
-    with open(LEG_FILE, "r", encoding="utf-8") as fh:
-        LEGIT_DOMAINS = {normalize_domain(line) for line in fh if line.strip()}
-except Exception:
-    LEGIT_DOMAINS = set()
+# Bump when the extracted features change meaning (invalidates feature_store entries)
+# 2: is_punycode / punycode_severity are live (always 0 before); retrain the model
+FEATURES_VERSION = 2
 
 # ----- Whitelist check: only exact base or www.base allowed -----
-def is_legit_domain(host_or_url: str) -> bool:
+def is_legit_domain(host_or_url) -> bool:
     """
     Return True only if the host is exactly 'domain.tld' or 'www.domain.tld'
-    and that registrable domain is present in LEGIT_DOMAINS.
+    and that registrable domain is present in the legit-domain index.
+    Accepts a host, a URL or a ParsedURL.
     """
     if not host_or_url:
         return False
-    host_or_url = host_or_url.strip().lower()
-    # ensure we operate on host part
-    if host_or_url.startswith("http://") or host_or_url.startswith("https://"):
-        try:
-            host_or_url = urlparse(host_or_url).hostname or host_or_url
-        except Exception:
-            pass
-    # extract subdomain/domain/tld
-    ext = tldextract.extract(host_or_url)
-    if not ext.domain or not ext.suffix:
+    if not isinstance(host_or_url, ParsedURL):
+        host_or_url = parse_url(host_or_url.strip().lower())
+    base = host_or_url.registrable
+    if not base:
         return False
-    base = f"{ext.domain}.{ext.suffix}"
-    sub = ext.subdomain  # may be "" or "www" or other subdomains
-    if base not in LEGIT_DOMAINS:
+    sub = host_or_url.subdomain  # may be "" or "www" or other subdomains
+    if not LEGIT_INDEX.has_domain(base):
         return False
     # allow exact base or www.base only
     if sub == "" or sub == "www":
@@ -82,17 +43,6 @@ def is_legit_domain(host_or_url: str) -> bool:
 def get_domain_age(domain: str) -> int:
     return -1
 
-def get_ssl_validity(domain: str) -> bool:
-    try:
-        ctx = ssl.create_default_context()
-        with ctx.wrap_socket(socket.socket(), server_hostname=domain) as s:
-            s.settimeout(3)
-            s.connect((domain, 443))
-            cert = s.getpeercert()
-            return bool(cert)
-    except Exception:
-        return False
-
 def detect_homograph(domain: str) -> bool:
     try:
         ascii_version = idna.encode(domain).decode()
@@ -100,83 +50,113 @@ def detect_homograph(domain: str) -> bool:
     except Exception:
         return False
 
-def brand_similarity_score(domain: str) -> dict:
-    return {brand: levenshtein(domain, brand) for brand in BRAND_KEYWORDS}
+def brand_similarity_score(domain: str, subdomain: str = "") -> dict:
+    """{brand: edit distance} for protected brands the domain or its subdomain labels imitate."""
+    return get_brand_index().match_host(domain, subdomain)
 
-def count_redirects(url: str) -> int:
-    try:
-        r = requests.get(url, timeout=3, allow_redirects=True)
-        return len(r.history)
-    except Exception:
-        return 0
+def brand_min_distance(domain: str, brand_distances: dict) -> int:
+    """
+    brand_similarity_score: the smallest edit distance from the domain label to
+    any brand (as before the brand index, not capped at the lookalike radius),
+    or a closer lookalike found in a subdomain label / hyphen token.
+    """
+    if not domain:
+        return NO_MATCH_SCORE
+    nearest = get_brand_index().nearest_distance(domain)
+    candidates = list(brand_distances.values()) + ([nearest] if nearest is not None else [])
+    return min(candidates) if candidates else NO_MATCH_SCORE
 
 def check_punycode(host: str) -> dict:
-    result = {"is_punycode": 0, "decoded_host": host, "contains_homoglyphs": 0, "punycode_severity": 0}
+    """
+    IDN / homograph check. A decoded host made only of Latin lookalikes has an
+    ASCII confusable skeleton; that skeleton is looked up against the legit-domain
+    and brand indexes to name what the host imitates.
+    Severity: 50 when it imitates a legit domain or brand, 10 for Latin
+    lookalikes with no known target (münchen.de), 0 for other IDNs.
+    """
+    result = {"is_punycode": 0, "decoded_host": host, "contains_homoglyphs": 0, "punycode_severity": 0,
+              "skeleton": None, "imitates": None}
     try:
-        if host and "xn--" in host:
+        if host and ("xn--" in host or not host.isascii()):
             result["is_punycode"] = 1
-            decoded = idna.decode(host)
+            decoded = idna.decode(host) if "xn--" in host else host
             result["decoded_host"] = decoded
-            homoglyph_map = {"а":"a","е":"e","о":"o","і":"i","ѕ":"s","р":"p","Ɩ":"l","ʘ":"o","ꞵ":"b"}
-            for ch in decoded:
-                if ch in homoglyph_map:
-                    result["contains_homoglyphs"] = 1
-                    break
-            result["punycode_severity"] = 50 if result["contains_homoglyphs"] else 30
+            skel = ascii_skeleton(decoded)
+            if skel is not None and not decoded.isascii():
+                result["contains_homoglyphs"] = 1
+                result["skeleton"] = skel
+                result["imitates"] = _imitated_name(decoded)
+            if result["imitates"]:
+                result["punycode_severity"] = 50
+            elif result["contains_homoglyphs"]:
+                result["punycode_severity"] = 10
     except Exception:
         pass
     return result
 
-def load_valid_tlds():
-    try:
-        resp = requests.get("https://data.iana.org/TLD/tlds-alpha-by-domain.txt", timeout=5)
-        return {line.strip().lower() for line in resp.text.splitlines() if line and not line.startswith("#")}
-    except Exception:
-        return {"com", "org", "net", "edu", "gov", "mil", "int", "info", "biz", "xyz", "ai", "in", "us", "uk", "de"}
-
-VALID_TLDS = load_valid_tlds()
+def _imitated_name(decoded_host: str):
+    """Legit domain or brand whose skeleton matches the host's registrable domain / labels."""
+    ext = tld_extract(decoded_host)
+    if not ext.domain or not ext.suffix:
+        return None
+    registrable = f"{ext.domain}.{ext.suffix}"
+    target = LEGIT_INDEX.imitated_domain(skeleton(registrable))
+    if target and target != registrable:
+        return target
+    brands = get_brand_index()
+    for label in [ext.domain] + (ext.subdomain or "").split("."):
+        if label and label.isascii() is False:
+            brand = brands.imitated_brand(skeleton(label))
+            if brand:
+                return brand
+    return None
 
 def check_uncommon_port(parsed) -> bool:
     return parsed.port not in (80, 443) if parsed and parsed.port else False
 
-def is_valid_url(u: str) -> bool:
-    u = (u or "").strip()
-    if " " in u or not u:
+def is_valid_url(u) -> bool:
+    pu = parse_url(u)
+    raw = pu.raw.strip()
+    if " " in raw or not raw:
         return False
-    if not u.startswith(("http://", "https://")):
-        u = "http://" + u
-    try:
-        p = urlparse(u)
-        if not p.hostname or "." not in p.hostname:
-            return False
-        ext = tldextract.extract(p.hostname)
-        return bool(ext.domain and ext.suffix)
-    except Exception:
+    if raw != pu.raw:
+        pu = ParsedURL(raw)
+    if not pu.host or "." not in pu.host:
         return False
+    return bool(pu.registrable)
 
 # ---------------- core: extract_url_features ----------------
-def extract_url_features(u: str) -> dict:
-    # parse with default scheme if none
-    try:
-        parsed = urlparse(u if u.startswith(("http://", "https://")) else "http://" + (u or ""))
-    except Exception:
+def extract_url_features(u, probe=None) -> dict:
+    """
+    u: URL string or ParsedURL (score_url passes the one built for the input).
+    probe: result of probe.probe_url(u) when the caller already fetched the URL
+    (score_url does, and reads reachability from the same fetch). Without it a
+    single streamed fetch is made here.
+    """
+    parsed = parse_url(u)
+    u = parsed.raw
+    if parsed.parsed is None:
         return {}
 
-    host = (parsed.hostname or "").lower().strip()
+    host = parsed.host
     if not host:
         return {}
 
-    ext = tldextract.extract(host)
-    domain = (ext.domain or "").lower()
-    tld = (ext.suffix or "").lower()
-    full_domain = f"{domain}.{tld}" if domain and tld else ""
+    domain = parsed.domain
+    tld = parsed.suffix
 
     # require valid tld domain (reject plain 'google')
     if not domain or not tld:
         return {"error": "invalid_domain"}
 
+    legit = is_legit_domain(parsed)
+    if probe is None:
+        probe = probe_url(parsed)
+
+    VALID_TLDS = valid_tlds()
+
     # If the **host** is an exact whitelist match (base or www.base) → safe early return
-    if is_legit_domain(host):
+    if legit:
         features = {
             "scheme": parsed.scheme,
             "scheme_https": int(parsed.scheme == "https"),
@@ -190,8 +170,8 @@ def extract_url_features(u: str) -> dict:
             "tld_suspicious": int((tld not in VALID_TLDS) or (tld in SUSPICIOUS_TLDS)),
             "subdomain_depth": host.count("."),
             "digits_ratio": sum(c.isdigit() for c in host) / max(len(host), 1),
-            "path_length": len(parsed.path or ""),
-            "query_length": len(parsed.query or ""),
+            "path_length": len(parsed.path),
+            "query_length": len(parsed.query),
             "fragment_present": int(bool(parsed.fragment)),
             "port_present": int(parsed.port is not None),
             "port": parsed.port if parsed.port else None,
@@ -199,7 +179,7 @@ def extract_url_features(u: str) -> dict:
             "word_hits": [],
             "word_hits_count": 0,
             "domain_age_days": get_domain_age(domain),
-            "ssl_valid": int(get_ssl_validity(domain) if parsed.scheme == "https" else 0),
+            "ssl_valid": int(probe["ssl_valid"] if parsed.scheme == "https" else 0),
             "homograph": int(detect_homograph(domain)),
             "brand_similarity": {},
             "brand_similarity_score": 0,
@@ -209,27 +189,28 @@ def extract_url_features(u: str) -> dict:
         return features
 
     # NOT legit → compute suspicious features
-    word_hits = [w for w in SUSPICIOUS_WORDS if w in (u or "").lower()]
-    brand_distances = brand_similarity_score(domain) if domain else {}
-    brand_similarity_score_val = min(brand_distances.values()) if brand_distances else 10
+    word_hits = list(keyword_hits(u).get(SUSPICIOUS_WORDS, ()))
+    brand_distances = brand_similarity_score(domain, parsed.subdomain) if domain else {}
+    brand_similarity_score_val = brand_min_distance(domain, brand_distances)
     tld_valid = tld in VALID_TLDS
     tld_suspicious = int((not tld_valid) or (tld in SUSPICIOUS_TLDS))
+    punycode = check_punycode(host)
 
     features = {
         "scheme": parsed.scheme,
         "scheme_https": int(parsed.scheme == "https"),
-        "contains_at": int("@" in (u or "")),
-        "host_is_ip": int(bool(re.match(r"^\d{1,3}(\.\d{1,3}){3}$", host))),
+        "contains_at": int("@" in u),
+        "host_is_ip": int(parsed.is_ip),
         "hyphens": host.count("-"),
-        "length": len(u or ""),
+        "length": len(u),
         "is_legit": False,
         "tld": tld,
         "tld_valid": int(tld_valid),
         "tld_suspicious": tld_suspicious,
         "subdomain_depth": host.count("."),
         "digits_ratio": sum(c.isdigit() for c in host) / max(len(host), 1),
-        "path_length": len(parsed.path or ""),
-        "query_length": len(parsed.query or ""),
+        "path_length": len(parsed.path),
+        "query_length": len(parsed.query),
         "fragment_present": int(bool(parsed.fragment)),
         "port_present": int(parsed.port is not None),
         "port": parsed.port if parsed.port else None,
@@ -237,11 +218,13 @@ def extract_url_features(u: str) -> dict:
         "word_hits": word_hits,
         "word_hits_count": len(word_hits),
         "domain_age_days": get_domain_age(domain),
-        "ssl_valid": int(get_ssl_validity(domain) if parsed.scheme == "https" else 0),
+        "ssl_valid": int(probe["ssl_valid"] if parsed.scheme == "https" else 0),
         "homograph": int(detect_homograph(domain)),
+        "is_punycode": punycode["is_punycode"],
+        "punycode": punycode,
         "brand_similarity": brand_distances,
         "brand_similarity_score": brand_similarity_score_val,
-        "redirect_count": count_redirects(u),
+        "redirect_count": probe["redirect_count"],
     }
 
     print("Extracted URL features:", features)
@@ -0,0 +1,130 @@
+# detection/firestore_shards.py
+"""
+Sharded Firestore storage for the schema and the scored results.
+
+Instead of one document holding everything (capped at 1 MiB), a parent
+document (threat_data/schema, threat_data/scored) keeps only metadata and
+each bucket is a subcollection of shard documents:
+
+    threat_data/schema                  {"format": "sharded", "shard_size", "counts", "updated"}
+    threat_data/schema/urls/00000       {"items": {id: item, ...}}   <= shard_size items
+    threat_data/schema/urls/00001       ...
+    threat_data/schema/apps/00000       ...
+
+Shards are written through ShardWriter (several shard documents per batch
+commit) and read back one at a time with iter_shards(), so memory follows
+the shard size, not the dataset size. A legacy parent holding the whole
+schema as "schema_json" is still readable.
+"""
+import json
+from datetime import datetime
+
+from .config import SHARD_SIZE, SHARD_BATCH_DOCS
+
+BUCKETS = ("urls", "apps", "content")
+
+
+def shard_id(n: int) -> str:
+    return f"{n:05d}"
+
+
+class ShardWriter:
+    """Buffers shard documents under parent_ref/<bucket>/ and commits them in batches."""
+
+    def __init__(self, client, parent_ref, batch_docs: int = SHARD_BATCH_DOCS):
+        self.client = client
+        self.parent_ref = parent_ref
+        self.batch_docs = max(1, batch_docs)
+        self._pending = []
+        self.written = {}   # bucket -> set of shard ids
+        self.counts = {}    # bucket -> items written
+
+    def put(self, bucket: str, shard: str, items: dict):
+        self._pending.append((bucket, shard, items))
+        self.written.setdefault(bucket, set()).add(shard)
+        self.counts[bucket] = self.counts.get(bucket, 0) + len(items)
+        if len(self._pending) >= self.batch_docs:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch = self.client.batch()
+        for bucket, shard, items in self._pending:
+            batch.set(self.parent_ref.collection(bucket).document(shard), {"items": items})
+        batch.commit()
+        self._pending = []
+
+    def prune(self, buckets=BUCKETS):
+        """Delete shard documents left over from an earlier, larger write."""
+        for bucket in buckets:
+            keep = self.written.get(bucket, set())
+            stale = [ref for ref in self.parent_ref.collection(bucket).list_documents() if ref.id not in keep]
+            for start in range(0, len(stale), 500):
+                batch = self.client.batch()
+                for ref in stale[start:start + 500]:
+                    batch.delete(ref)
+                batch.commit()
+
+    def close(self, shard_size: int = SHARD_SIZE, buckets=BUCKETS, **meta):
+        """Flush, prune stale shards and (over)write the parent metadata document."""
+        self.flush()
+        self.prune(buckets)
+        self.parent_ref.set({
+            "format": "sharded",
+            "shard_size": shard_size,
+            "counts": {b: self.counts.get(b, 0) for b in buckets},
+            "updated": datetime.utcnow().isoformat() + "Z",
+            **meta,
+        })
+
+
+def write_sharded(client, parent_ref, bucket_items, shard_size: int = SHARD_SIZE) -> dict:
+    """
+    bucket_items: iterable of (bucket, item_id, item), grouped by bucket.
+    Writes them as shards of `shard_size` items; returns item counts per bucket.
+    """
+    writer = ShardWriter(client, parent_ref)
+    current_bucket, shard_no, shard = None, {}, {}
+    for bucket, item_id, item in bucket_items:
+        if bucket != current_bucket:
+            if shard:
+                writer.put(current_bucket, shard_id(shard_no[current_bucket]), shard)
+            current_bucket, shard = bucket, {}
+            shard_no.setdefault(bucket, 0)
+        shard[item_id] = item
+        if len(shard) >= shard_size:
+            writer.put(bucket, shard_id(shard_no[bucket]), shard)
+            shard_no[bucket] += 1
+            shard = {}
+    if shard:
+        writer.put(current_bucket, shard_id(shard_no[current_bucket]), shard)
+    writer.close(shard_size=shard_size)
+    return writer.counts
+
+
+def read_meta(parent_ref) -> dict:
+    snap = parent_ref.get()
+    return (snap.to_dict() if snap.exists else None) or {}
+
+
+def iter_shards(parent_ref, buckets=BUCKETS, meta: dict = None):
+    """
+    Yield (bucket, shard_id, {item_id: item}) one shard at a time.
+    A legacy parent ({"schema_json": "<whole schema>"}) is split on the fly.
+    """
+    meta = read_meta(parent_ref) if meta is None else meta
+    if "schema_json" in meta:
+        legacy = json.loads(meta["schema_json"])
+        for bucket in buckets:
+            ids = list(legacy.get(bucket, {}))
+            for n, start in enumerate(range(0, len(ids), SHARD_SIZE)):
+                yield bucket, shard_id(n), {k: legacy[bucket][k] for k in ids[start:start + SHARD_SIZE]}
+        return
+    for bucket in buckets:
+        # Refs first, then one get() per shard: a stream() held open while the
+        # caller scores shards would run into the query deadline.
+        for ref in sorted(parent_ref.collection(bucket).list_documents(), key=lambda r: r.id):
+            snap = ref.get()
+            if snap.exists:
+                yield bucket, ref.id, (snap.to_dict() or {}).get("items", {})
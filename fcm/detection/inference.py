@@ -0,0 +1,54 @@
+# detection/inference.py
+"""
+Low-latency model inference on a raw xgboost Booster.
+
+Skips the sklearn XGBClassifier wrapper (and the DMatrix it builds per call):
+rows are encoded straight into contiguous float32 arrays (see encoder.py) and
+scored with Booster.inplace_predict. The Booster's thread count is pinned
+(FCM_XGB_NTHREAD) so concurrent requests under uvicorn don't each fan out to
+every core.
+"""
+import os
+
+import numpy as np
+import xgboost as xgb
+
+XGB_NTHREAD = int(os.environ.get("FCM_XGB_NTHREAD", 1))
+
+
+class BoosterModel:
+    """Binary classifier loaded from xgboost_model.json."""
+
+    def __init__(self, path: str, nthread: int = XGB_NTHREAD):
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+        self.set_threads(nthread)
+        self.num_features = self.booster.num_features()
+
+    def set_threads(self, nthread: int):
+        self.nthread = max(1, int(nthread))
+        self.booster.set_param({"nthread": self.nthread})
+
+    @property
+    def feature_names(self):
+        return self.booster.feature_names
+
+    def predict_positive(self, X) -> np.ndarray:
+        """P(class 1) for each row of X (float32, shape (n, num_features))."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # validate_features=False: inputs are positional, ordered by feature_columns.json
+        probs = self.booster.inplace_predict(X, validate_features=False)
+        if probs.ndim == 2:   # multi:softprob style output
+            probs = probs[:, 1]
+        return probs
+
+    def predict_proba(self, X) -> np.ndarray:
+        """sklearn-compatible (n, 2) probabilities."""
+        p1 = self.predict_positive(X)
+        return np.column_stack([1.0 - p1, p1])
+
+
+def load_booster(path: str, nthread: int = XGB_NTHREAD) -> BoosterModel:
+    return BoosterModel(path, nthread=nthread)
@@ -0,0 +1,173 @@
+# detection/keywords.py
+"""
+Shared multi-pattern keyword matcher.
+
+Every keyword list the extractors use (detection/data/keywords/*.txt, override
+the directory with FCM_KEYWORDS_DIR) plus the sector keywords in sectors.json
+is compiled into ONE Aho-Corasick automaton. A lowered URL is scanned once and
+the hits of every list come out of that single pass, so growing a list to tens
+of thousands of terms does not slow matching down linearly.
+
+Uses pyahocorasick when installed, otherwise a pure-Python automaton.
+Results are cached per string, so the URL, app and content extractors and
+detect_sector share the scan of the same URL.
+"""
+import os
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+
+from .config import KEYWORDS_DIR, SECTORS_FILE
+
+SECTOR_PREFIX = "sector:"
+
+
+def load_keyword_file(path: str) -> list:
+    """One lowercase term per line; '#' comments and blanks ignored, order kept."""
+    terms = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip().lower()
+                if line and not line.startswith("#"):
+                    terms.append(line)
+    except Exception as e:
+        print("⚠️ Could not load keyword list from", path, ":", e)
+    return list(dict.fromkeys(terms))
+
+def load_keyword_groups(keywords_dir: str = KEYWORDS_DIR, sectors_file: str = SECTORS_FILE) -> dict:
+    """{group: [terms]} for every *.txt in keywords_dir plus 'sector:<name>' groups."""
+    groups = {}
+    try:
+        names = sorted(n for n in os.listdir(keywords_dir) if n.endswith(".txt"))
+    except Exception as e:
+        print("⚠️ Could not list keyword directory", keywords_dir, ":", e)
+        names = []
+    for name in names:
+        groups[name[:-4]] = load_keyword_file(os.path.join(keywords_dir, name))
+    try:
+        with open(sectors_file, "r", encoding="utf-8") as f:
+            for sector, terms in json.load(f).items():
+                groups[SECTOR_PREFIX + sector] = list(dict.fromkeys(t.lower() for t in terms if t))
+    except Exception as e:
+        print("⚠️ Could not load sector keywords from", sectors_file, ":", e)
+    return groups
+
+
+class _Automaton:
+    """Minimal Aho-Corasick automaton: iter(text) yields every pattern occurring in text."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                node = nxt
+            self.out[node] = self.out[node] + (pattern,)
+
+        # Breadth-first failure links; each node also inherits its fail node's outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def iter(self, text: str):
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield from out[node]
+
+
+class _PyAhoCorasick:
+    def __init__(self, automaton):
+        self.automaton = automaton
+
+    def iter(self, text: str):
+        for _, pattern in self.automaton.iter(text):
+            yield pattern
+
+
+class KeywordMatcher:
+    def __init__(self, groups: dict):
+        self.groups = {g: list(terms) for g, terms in groups.items()}
+        # term -> [(group, position in that group's list)]
+        self.owners = {}
+        for group, terms in self.groups.items():
+            for i, term in enumerate(terms):
+                self.owners.setdefault(term, []).append((group, i))
+        self._automaton = self._build(list(self.owners))
+
+    @staticmethod
+    def _build(patterns):
+        try:
+            import ahocorasick
+        except ImportError:
+            return _Automaton(patterns)
+        automaton = ahocorasick.Automaton()
+        for p in patterns:
+            automaton.add_word(p, p)
+        if patterns:
+            automaton.make_automaton()
+            return _PyAhoCorasick(automaton)
+        return _Automaton(patterns)
+
+    def find(self, text: str) -> dict:
+        """{group: (terms found in text, in list order)} for groups with at least one hit."""
+        if not text:
+            return {}
+        found = {}
+        for term in set(self._automaton.iter(text)):
+            for group, i in self.owners[term]:
+                found.setdefault(group, []).append((i, term))
+        return {g: tuple(t for _, t in sorted(hits)) for g, hits in found.items()}
+
+
+_matcher = None
+_lock = threading.Lock()
+
+def get_matcher() -> KeywordMatcher:
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                _matcher = KeywordMatcher(load_keyword_groups())
+    return _matcher
+
+def keyword_list(group: str) -> list:
+    return list(get_matcher().groups.get(group, []))
+
+@lru_cache(maxsize=4096)
+def keyword_hits(text: str) -> dict:
+    """
+    Hits of every keyword list in `text` (lowercased first), from one scan.
+    Cached: treat the returned dict as read-only.
+    """
+    return get_matcher().find((text or "").lower())
+
+def detect_sector(url: str) -> str:
+    """First sector in sectors.json order with a keyword in the URL, else 'general'."""
+    hits = keyword_hits(url)
+    for group in get_matcher().groups:
+        if group.startswith(SECTOR_PREFIX) and group in hits:
+            return group[len(SECTOR_PREFIX):]
+    return "general"
@@ -0,0 +1,171 @@
+# detection/parsed_url.py
+"""
+Parse-once URL value shared by the whole scoring pipeline.
+
+score_input() builds one ParsedURL per input and hands it to is_valid_url,
+the feature extractors, the legit checks, the probe cache key and the rules,
+so the string is urlparse()d once and tldextract()ed once (tld.extract is
+LRU-cached on top of that). Derived fields are computed on first access and
+memoized; the value itself is immutable.
+"""
+import re
+from functools import cached_property
+from urllib.parse import urlparse
+
+import idna
+
+from .tld import extract as tld_extract
+
+_IPV4 = re.compile(r"^\d{1,3}(\.\d{1,3}){3}$")
+
+
+def normalize_input(u: str) -> str:
+    """
+    Input as it is scored and cached: surrounding whitespace removed, scheme
+    and host lowercased; path, query and fragment kept verbatim.
+    """
+    u = (u or "").strip()
+    scheme = ""
+    for prefix in ("http://", "https://"):
+        if u[:len(prefix)].lower() == prefix:
+            scheme, u = prefix, u[len(prefix):]
+            break
+    if not scheme and "://" in u:
+        return u    # some other scheme: leave it alone
+    end = len(u)
+    for sep in "/?#":
+        i = u.find(sep)
+        if i != -1:
+            end = min(end, i)
+    return scheme + u[:end].lower() + u[end:]
+
+
+class ParsedURL:
+    """
+    raw:  the input exactly as given (what results report back)
+    url:  raw with "http://" prepended when it has no http(s) scheme
+    """
+
+    def __init__(self, raw: str):
+        raw = raw or ""
+        object.__setattr__(self, "raw", raw)
+        object.__setattr__(self, "url", raw if raw.startswith(("http://", "https://")) else "http://" + raw)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParsedURL is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ParsedURL is immutable")
+
+    def __repr__(self):
+        return f"ParsedURL({self.raw!r})"
+
+    def __str__(self):
+        return self.raw
+
+    def __eq__(self, other):
+        return isinstance(other, ParsedURL) and other.raw == self.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    # --- urlparse ---
+    @cached_property
+    def parsed(self):
+        """urlparse() result, or None when the URL cannot be parsed."""
+        try:
+            return urlparse(self.url)
+        except Exception:
+            return None
+
+    @cached_property
+    def scheme(self) -> str:
+        return self.parsed.scheme if self.parsed else ""
+
+    @cached_property
+    def host(self) -> str:
+        """Lowercased hostname ("" when missing)."""
+        try:
+            return (self.parsed.hostname or "").lower().strip() if self.parsed else ""
+        except Exception:
+            return ""
+
+    @cached_property
+    def host_nowww(self) -> str:
+        return self.host[4:] if self.host.startswith("www.") else self.host
+
+    @cached_property
+    def port(self):
+        """Explicit port, None when absent or out of range."""
+        try:
+            return self.parsed.port if self.parsed else None
+        except ValueError:
+            return None
+
+    @cached_property
+    def path(self) -> str:
+        return (self.parsed.path or "") if self.parsed else ""
+
+    @cached_property
+    def query(self) -> str:
+        return (self.parsed.query or "") if self.parsed else ""
+
+    @cached_property
+    def fragment(self) -> str:
+        return (self.parsed.fragment or "") if self.parsed else ""
+
+    @cached_property
+    def is_ip(self) -> bool:
+        return bool(_IPV4.match(self.host))
+
+    # --- public suffix split of the host ---
+    @cached_property
+    def ext(self):
+        return tld_extract(self.host)
+
+    @cached_property
+    def domain(self) -> str:
+        return (self.ext.domain or "").lower()
+
+    @cached_property
+    def subdomain(self) -> str:
+        return (self.ext.subdomain or "").lower()
+
+    @cached_property
+    def suffix(self) -> str:
+        return (self.ext.suffix or "").lower()
+
+    @cached_property
+    def registrable(self) -> str:
+        """domain.suffix, or "" when the host has no registrable domain."""
+        return f"{self.domain}.{self.suffix}" if self.domain and self.suffix else ""
+
+    # --- IDNA forms ---
+    @cached_property
+    def ascii_host(self) -> str:
+        """IDNA (xn--) form of the host; the host itself when it cannot be encoded."""
+        if self.host.isascii():
+            return self.host
+        try:
+            return idna.encode(self.host).decode()
+        except Exception:
+            return self.host
+
+    @cached_property
+    def unicode_host(self) -> str:
+        """Decoded (Unicode) form of an xn-- host; the host itself otherwise."""
+        if "xn--" not in self.host:
+            return self.host
+        try:
+            return idna.decode(self.host)
+        except Exception:
+            return self.host
+
+    @cached_property
+    def is_idn(self) -> bool:
+        return "xn--" in self.host or not self.host.isascii()
+
+
+def parse_url(u) -> ParsedURL:
+    """ParsedURL for a string; a ParsedURL is passed through unchanged."""
+    return u if isinstance(u, ParsedURL) else ParsedURL(u)
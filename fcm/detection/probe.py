@@ -0,0 +1,193 @@
+# detection/probe.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import PROBE_DEADLINE, PROBE_TIMEOUT, PROBE_WORKERS
+from .probe_cache import PROBE_CACHE, probe_cache_key
+from .parsed_url import parse_url
+
+# Blocking fetches run on our own pool (not the loop's default executor) so that
+# asyncio.run() returns at the deadline instead of waiting for a hung socket.
+_EXECUTOR = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="fcm-probe")
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+def _empty_probe(url: str) -> dict:
+    return {
+        "url": url,
+        "final_url": None,
+        "history": [],           # [{"url": ..., "status_code": ...}] for every redirect hop
+        "redirect_count": 0,
+        "status_code": None,     # status of the final response
+        "reachable": False,
+        "ssl_valid": False,      # TLS handshake to the URL's host verified
+        "peer_cert": None,       # certificate of the final hop (https only)
+        "error": None,           # None / "ssl" / "timeout" / "dns" / "refused" / "connection" / "redirects" / "error"
+        "timed_out": False,      # hit the per-URL deadline
+        "skipped": False,        # not fetched at all (offline / provisional scoring)
+    }
+
+def _peer_cert(resp):
+    """Certificate of the live (still unread) streamed connection, if it is TLS."""
+    try:
+        sock = resp.raw.connection.sock
+        return sock.getpeercert() or None
+    except Exception:
+        return None
+
+def _classify_connection_error(e) -> str:
+    msg = str(e)
+    if "NameResolutionError" in msg or "Name or service not known" in msg or "getaddrinfo" in msg:
+        return "dns"
+    if "Connection refused" in msg or "ConnectionRefusedError" in msg:
+        return "refused"
+    return "connection"
+
+# ----- Single-fetch probe -----
+def fetch_probe(u, timeout: float = PROBE_TIMEOUT) -> dict:
+    """
+    One streamed GET for a URL. Records the redirect history, the final status
+    and the peer certificate; the response body is never downloaded.
+    """
+    import requests   # deferred: keeps `import detection.engine` cheap for non-URL callers
+
+    url = parse_url(u).url
+    result = _empty_probe(url)
+    try:
+        with requests.get(url, stream=True, allow_redirects=True, timeout=timeout, headers=HEADERS) as resp:
+            result["history"] = [{"url": h.url, "status_code": h.status_code} for h in resp.history]
+            result["redirect_count"] = len(resp.history)
+            result["status_code"] = resp.status_code
+            result["final_url"] = resp.url
+            result["reachable"] = 200 <= resp.status_code < 400
+            if resp.url.startswith("https://"):
+                result["peer_cert"] = _peer_cert(resp)
+        # requests verifies certificates, so a completed https fetch had a valid one
+        result["ssl_valid"] = url.startswith("https://")
+    except requests.exceptions.SSLError:
+        result["error"] = "ssl"
+    except requests.exceptions.Timeout:
+        result["error"] = "timeout"
+    except requests.exceptions.TooManyRedirects:
+        result["error"] = "redirects"
+    except requests.exceptions.ConnectionError as e:
+        result["error"] = _classify_connection_error(e)
+    except Exception:
+        result["error"] = "error"
+    return result
+
+# Facts about the one URL that was fetched; the rest of a probe describes its host
+URL_FIELDS = ("final_url", "history", "status_code")
+
+def for_url(probe: dict, url: str) -> dict:
+    """
+    A host-level probe reported for another URL on that host: reachability,
+    SSL and redirect count are kept, the fetched URL's own final_url /
+    history / status_code are dropped, and "cached_from" names that URL.
+    """
+    probe = dict(probe)
+    if probe.get("url") != url:
+        probe["cached_from"] = probe.get("url")
+        for field in URL_FIELDS:
+            probe[field] = [] if field == "history" else None
+        probe["url"] = url
+    return probe
+
+def cached_probe(u, timeout: float = PROBE_TIMEOUT) -> dict:
+    """fetch_probe through the per-host cache (see probe_cache.py)."""
+    pu = parse_url(u)
+    key = probe_cache_key(pu)
+    hit = PROBE_CACHE.get(key)
+    if hit is not None:
+        hit = for_url(hit, pu.url)
+        hit["cached"] = True
+        return hit
+    result = fetch_probe(pu, timeout=timeout)
+    PROBE_CACHE.set(key, result)
+    return result
+
+# ----- Thin helpers kept for existing callers -----
+def url_exists(u, timeout: int = 5) -> bool:
+    """Check if a URL is reachable (2xx/3xx after following redirects)."""
+    return cached_probe(u, timeout=timeout)["reachable"]
+
+def count_redirects(url: str) -> int:
+    return cached_probe(url, timeout=3)["redirect_count"]
+
+def get_ssl_validity(domain: str) -> bool:
+    return cached_probe("https://" + domain, timeout=3)["ssl_valid"]
+
+# ----- Deadline-bounded probe -----
+def timed_out_probe(u) -> dict:
+    """Result reported for a URL whose probe did not finish before its deadline."""
+    result = _empty_probe(parse_url(u).url)
+    result["error"] = "timeout"
+    result["timed_out"] = True
+    return result
+
+def offline_probe(u) -> dict:
+    """Stand-in probe for scoring without any network access."""
+    result = _empty_probe(parse_url(u).url)
+    result["skipped"] = True
+    return result
+
+async def probe_url_async(u, deadline: float = PROBE_DEADLINE, on_done=None) -> dict:
+    """
+    Run cached_probe for one URL on the probe pool and wait at most `deadline`
+    seconds. A probe still running at the deadline reports an empty result
+    with timed_out set (its eventual result still lands in the cache).
+    on_done() is called on the event loop once the pool thread has actually
+    finished (or the fetch was cancelled before it started), which for a
+    timed-out probe is after this coroutine has returned.
+    """
+    loop = asyncio.get_running_loop()
+    future = _EXECUTOR.submit(cached_probe, u)
+    if on_done is not None:
+        def _done(_):
+            try:
+                loop.call_soon_threadsafe(on_done)
+            except RuntimeError:    # loop already closed
+                pass
+        future.add_done_callback(_done)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline)
+    except asyncio.TimeoutError:
+        return timed_out_probe(u)
+
+def probe_url(u, deadline: float = PROBE_DEADLINE) -> dict:
+    """Blocking wrapper around probe_url_async (for sync callers and threadpool handlers)."""
+    return asyncio.run(probe_url_async(u, deadline=deadline))
+
+# ----- Many URLs -----
+async def probe_many_async(urls, deadline: float = PROBE_DEADLINE, concurrency: int = PROBE_WORKERS) -> list:
+    """
+    Probe many URLs concurrently (at most `concurrency` in flight, each with its
+    own deadline). URLs that share a cache key are fetched once. Results are
+    returned in input order.
+    """
+    urls = [parse_url(u) for u in urls]
+    keys = [probe_cache_key(u) or u for u in urls]
+    first_url = {}
+    for u, key in zip(urls, keys):
+        first_url.setdefault(key, u)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(u):
+        async with sem:
+            return await probe_url_async(u, deadline=deadline)
+
+    results = await asyncio.gather(*(one(u) for u in first_url.values()))
+    by_key = dict(zip(first_url.keys(), results))
+
+    out = []
+    for u, key in zip(urls, keys):
+        out.append(for_url(by_key[key], u.url))
+    return out
+
+def probe_many(urls, deadline: float = PROBE_DEADLINE, concurrency: int = PROBE_WORKERS) -> list:
+    """Blocking wrapper around probe_many_async."""
+    urls = list(urls)
+    if not urls:
+        return []
+    return asyncio.run(probe_many_async(urls, deadline=deadline, concurrency=concurrency))
@@ -0,0 +1,161 @@
+# detection/probe_cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from .parsed_url import parse_url
+from .config import (
+    PROBE_CACHE_PATH, PROBE_CACHE_SIZE, PROBE_CACHE_DISK_SIZE,
+    PROBE_CACHE_TTL, PROBE_CACHE_NEGATIVE_TTL, PROBE_CACHE_KEY,
+)
+
+def probe_cache_key(u, mode: str = PROBE_CACHE_KEY) -> str:
+    """
+    Cache key for a URL's probe result.
+      mode "host":   scheme://host:port   (default)
+      mode "domain": scheme://domain.tld  (all subdomains share one entry)
+    """
+    pu = parse_url(u)
+    if not pu.host:
+        return ""
+    if mode == "domain" and pu.registrable:
+        return f"{pu.scheme}://{pu.registrable}"
+    return f"{pu.scheme}://{pu.host}:{pu.port or ''}"
+
+def is_negative(probe: dict) -> bool:
+    """Timeouts, NXDOMAIN, refused connections etc. get the shorter TTL."""
+    return bool(probe.get("error"))
+
+
+class ProbeCache:
+    """
+    Two-tier TTL cache for probe results: an in-process LRU in front of a
+    sqlite file that survives restarts. Both tiers are bounded by entry count.
+    """
+
+    def __init__(self, path=PROBE_CACHE_PATH, max_entries=PROBE_CACHE_SIZE,
+                 disk_max_entries=PROBE_CACHE_DISK_SIZE, ttl=PROBE_CACHE_TTL,
+                 negative_ttl=PROBE_CACHE_NEGATIVE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._mem = OrderedDict()     # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ----- disk tier -----
+    def _conn(self):
+        """Open the sqlite file on first use (None when the disk tier is disabled)."""
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS probes ("
+                    " key TEXT PRIMARY KEY, expires REAL, stored REAL, value TEXT)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print("⚠️ Probe cache disk tier disabled:", e)
+                self.path = None
+                self._db = None
+        return self._db
+
+    def _prune_disk(self, db):
+        db.execute("DELETE FROM probes WHERE expires < ?", (time.time(),))
+        (count,) = db.execute("SELECT COUNT(*) FROM probes").fetchone()
+        if count > self.disk_max_entries:
+            db.execute(
+                "DELETE FROM probes WHERE key IN "
+                "(SELECT key FROM probes ORDER BY stored ASC LIMIT ?)",
+                (count - self.disk_max_entries,),
+            )
+
+    # ----- memory tier -----
+    def _remember(self, key, expires, value):
+        self._mem[key] = (expires, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    # ----- public API -----
+    def get(self, key: str):
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(entry[1])
+                del self._mem[key]
+
+            db = self._conn()
+            if db is not None:
+                try:
+                    row = db.execute("SELECT expires, value FROM probes WHERE key = ?", (key,)).fetchone()
+                except Exception:
+                    row = None
+                if row and row[0] > now:
+                    value = json.loads(row[1])
+                    self._remember(key, row[0], value)
+                    self.disk_hits += 1
+                    return dict(value)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: dict):
+        if not key:
+            return
+        now = time.time()
+        expires = now + (self.negative_ttl if is_negative(value) else self.ttl)
+        with self._lock:
+            self._remember(key, expires, value)
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO probes (key, expires, stored, value) VALUES (?, ?, ?, ?)",
+                    (key, expires, now, json.dumps(value, default=str)),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 500 == 0:
+                    self._prune_disk(db)
+                db.commit()
+            except Exception as e:
+                print("⚠️ Probe cache write failed:", e)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM probes")
+                db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._mem),
+        }
+
+
+PROBE_CACHE = ProbeCache()
@@ -0,0 +1,90 @@
+# detection/provisional.py
+"""
+Tiered URL scoring: offline lexical verdict now, network enrichment later.
+
+provisional_score() runs only the score_url rules that need no network and
+returns immediately with "provisional": true and a detection_id. enrich()
+then runs the full, probed score_url (server.py schedules it as an asyncio
+task) and replaces the provisional entry in DETECTIONS, where
+GET /detect/result/{detection_id} picks it up, as "partial" when the
+probes ran out of time.
+
+DETECTIONS lives in process memory: with several uvicorn workers a
+follow-up request has to reach the worker that issued the id.
+"""
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from .config import DETECTION_STORE_SIZE, DETECTION_TTL, ENRICH_DEADLINE
+from .engine import score_url_lexical, score_url_async, Overloaded
+
+
+class DetectionStore:
+    """Bounded, expiring {detection_id: {"status", "result"}} map (oldest evicted first)."""
+
+    def __init__(self, max_entries: int = DETECTION_STORE_SIZE, ttl: float = DETECTION_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()   # id -> (expires, entry)
+        self._lock = threading.Lock()
+
+    def put(self, detection_id: str, status: str, result: dict):
+        with self._lock:
+            self._entries.pop(detection_id, None)
+            self._entries[detection_id] = (time.time() + self.ttl, {"status": status, "result": result})
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, detection_id: str):
+        with self._lock:
+            item = self._entries.get(detection_id)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.time():
+                del self._entries[detection_id]
+                return None
+            return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(1 for _, e in self._entries.values() if e["status"] == "pending")
+            return {"entries": len(self._entries), "pending": pending}
+
+
+DETECTIONS = DetectionStore()
+
+def provisional_score(u, sector="general") -> dict:
+    """Offline verdict with a fresh detection_id, registered as pending."""
+    result = score_url_lexical(u, sector)
+    result["detection_id"] = uuid.uuid4().hex
+    DETECTIONS.put(result["detection_id"], "pending", result)
+    return result
+
+async def enrich(detection_id: str, u, sector="general", deadline: float = ENRICH_DEADLINE, limiter=None) -> dict:
+    """
+    Full score (SSL, redirects, reachability) for a provisional detection.
+    The stored status becomes "final"; "partial" when the probes hit their
+    deadline (the network checks did not finish; the result keeps its
+    "partial": true); or "unavailable" (server busy) / "error" with the
+    provisional result kept.
+    """
+    try:
+        result = await score_url_async(u, sector, deadline=deadline, limiter=limiter)
+    except Overloaded:
+        entry = DETECTIONS.get(detection_id)
+        if entry is not None:
+            DETECTIONS.put(detection_id, "unavailable", entry["result"])
+        return None
+    except Exception as e:
+        print("⚠️ Enrichment failed for", detection_id, ":", e)
+        entry = DETECTIONS.get(detection_id)
+        if entry is not None:
+            DETECTIONS.put(detection_id, "error", entry["result"])
+        return None
+    result["detection_id"] = detection_id
+    result["provisional"] = False
+    DETECTIONS.put(detection_id, "partial" if result.get("partial") else "final", result)
+    return result
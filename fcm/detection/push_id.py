@@ -0,0 +1,43 @@
+# detection/push_id.py
+"""
+Client-side Firebase push IDs.
+
+Same format as the SDKs' push(): 8 chars of millisecond timestamp + 12 random
+chars, so keys generated here sort chronologically next to server-pushed ones.
+Generating them locally lets a batch of records go out in one multi-path
+update() (and be retried without creating duplicates).
+"""
+import time
+import random
+import threading
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+_lock = threading.Lock()
+_rand = random.SystemRandom()
+_last_ms = 0
+_last_rand = [0] * 12
+
+def generate_push_id(now_ms: int = None) -> str:
+    global _last_ms
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    with _lock:
+        if now_ms == _last_ms:
+            # Same millisecond: increment the random part so IDs stay unique and ordered
+            i = 11
+            while i >= 0 and _last_rand[i] == 63:
+                _last_rand[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand[i] += 1
+        else:
+            _last_ms = now_ms
+            for i in range(12):
+                _last_rand[i] = _rand.randrange(64)
+        rand_part = "".join(PUSH_CHARS[r] for r in _last_rand)
+
+    ts_part = []
+    for _ in range(8):
+        ts_part.append(PUSH_CHARS[now_ms % 64])
+        now_ms //= 64
+    return "".join(reversed(ts_part)) + rand_part
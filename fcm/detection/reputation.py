@@ -0,0 +1,134 @@
+# detection/reputation.py
+import os
+import time
+import threading
+from urllib.parse import urlparse
+
+from .tld import extract as tld_extract
+from .confusables import skeleton
+from .config import LEGIT_DOMAINS_FILE, LEGIT_HOSTS_FILE, LEGIT_RELOAD_INTERVAL
+
+def normalize_domain(domain: str) -> str:
+    """Return registrable domain (domain.suffix) or empty string."""
+    if not domain:
+        return ""
+    domain = domain.strip().lower()
+    # strip scheme and trailing slash and possible credentials
+    if domain.startswith("http://"):
+        domain = domain[7:]
+    elif domain.startswith("https://"):
+        domain = domain[8:]
+    domain = domain.split("/")[0]
+    if domain.startswith("www."):
+        domain = domain[4:]
+    try:
+        ext = tld_extract(domain)
+        if ext.domain and ext.suffix:
+            return f"{ext.domain}.{ext.suffix}"
+    except Exception:
+        pass
+    return domain
+
+def load_legit_domains(path) -> set:
+    """Registrable domains (domain.tld) listed in a whitelist file, one URL/host per line."""
+    s = set()
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip().lower()
+                if not line:
+                    continue
+                # strip scheme if present and take hostname
+                try:
+                    p = urlparse(line if line.startswith(("http://", "https://")) else "http://" + line)
+                    host = (p.hostname or line).lower()
+                except Exception:
+                    host = line
+                d = normalize_domain(host)
+                if d:
+                    s.add(d)
+    except Exception as e:
+        print("Could not load legit domains from", path, ":", e)
+    return s
+
+def load_legit_hosts(path) -> set:
+    """Exact hosts listed in a whitelist file, one per line."""
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return {line.strip().lower() for line in fh if line.strip()}
+    except FileNotFoundError:
+        return set()
+    except Exception as e:
+        print("Could not load legit hosts from", path, ":", e)
+        return set()
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class DomainIndex:
+    """
+    Legit-domain whitelist loaded once and held as frozensets for O(1) lookups.
+    Source files are stat'ed at most every `reload_interval` seconds; when an
+    mtime changes a new snapshot is built and swapped in with one assignment,
+    so readers never see a half-loaded list.
+    """
+
+    def __init__(self, domains_file=LEGIT_DOMAINS_FILE, hosts_file=LEGIT_HOSTS_FILE,
+                 reload_interval=LEGIT_RELOAD_INTERVAL):
+        self.domains_file = domains_file
+        self.hosts_file = hosts_file
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._snapshot = None     # (mtimes, domains, hosts, {skeleton: domain})
+        self._checked_at = 0.0
+
+    def _load(self, mtimes):
+        domains = frozenset(load_legit_domains(self.domains_file)) if mtimes[0] is not None else frozenset()
+        hosts = frozenset(load_legit_hosts(self.hosts_file)) if mtimes[1] is not None else frozenset()
+        skeletons = {skeleton(d): d for d in domains}
+        self._snapshot = (mtimes, domains, hosts, skeletons)
+
+    def _current(self):
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._checked_at < self.reload_interval:
+            return snap
+        with self._lock:
+            if self._snapshot is None or now - self._checked_at >= self.reload_interval:
+                mtimes = (_mtime(self.domains_file), _mtime(self.hosts_file))
+                if self._snapshot is None or mtimes != self._snapshot[0]:
+                    self._load(mtimes)
+                self._checked_at = now
+            return self._snapshot
+
+    def has_domain(self, registrable: str) -> bool:
+        """True if domain.tld is in the registrable-domain list (data/leg.txt)."""
+        return registrable in self._current()[1]
+
+    def has_host(self, host: str) -> bool:
+        """True if the exact host is in the host list (legit.txt)."""
+        return host in self._current()[2]
+
+    def imitated_domain(self, registrable_skeleton: str):
+        """Legit domain whose confusable skeleton equals the given one, or None."""
+        return self._current()[3].get(registrable_skeleton)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever either whitelist file changes on disk."""
+        return repr(self._current()[0])
+
+    @property
+    def domains(self) -> frozenset:
+        return self._current()[1]
+
+    @property
+    def hosts(self) -> frozenset:
+        return self._current()[2]
+
+
+LEGIT_INDEX = DomainIndex()
@@ -0,0 +1,137 @@
+# detection/result_cache.py
+"""
+Result cache in front of score_url / score_app / score_content for the
+/detect endpoints (server.py, api.py, patched_api.py).
+
+Keys are (kind, input as sent, scoring parameters, model version, rules
+version); the input is scored and echoed exactly as the caller sent it.
+The rules version combines RULES_VERSION, a hash of rules.py and engine.py
+and the rule data. A new model, edited scoring code, an edited brand/keyword
+list or a reloaded whitelist changes the key, so stale entries are never
+matched again and simply age out of the LRU. TTL depends on the verdict
+(config.RESULT_TTL). Partial and provisional results are never stored.
+A hit is marked "cached": true, gets a fresh "timestamp" and keeps the time
+it was scored as "cached_at".
+"""
+import copy
+import time
+import hashlib
+import threading
+from datetime import datetime
+from functools import lru_cache
+from collections import OrderedDict
+
+from .config import RESULT_CACHE_SIZE, RESULT_TTL
+from . import rules, engine
+from .rules import RULES_VERSION
+from .engine import model_version
+from .reputation import LEGIT_INDEX
+from .feature_store import data_version
+
+
+@lru_cache(maxsize=1)
+def _rules_digest() -> str:
+    """Hash of the scoring code (rules.py, engine.py): edited reasons/points change the key."""
+    digest = hashlib.sha1()
+    for module in (rules, engine):
+        with open(module.__file__, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:12]
+
+def rules_version() -> str:
+    return f"{RULES_VERSION}.{_rules_digest()}.{data_version()}.{LEGIT_INDEX.version}"
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: dict = RESULT_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = dict(ttl)
+        self._entries = OrderedDict()   # key -> (expires, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def key(self, kind: str, u: str, **params) -> tuple:
+        return (kind, u, tuple(sorted(params.items())), model_version(), rules_version())
+
+    def get(self, key: tuple):
+        """A copy of the cached result, or None."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] < time.time():
+                del self._entries[key]
+                self.expired += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(item[1])
+
+    def set(self, key: tuple, result: dict):
+        if not result or result.get("partial") or result.get("provisional"):
+            return
+        ttl = self.ttl.get(result.get("status"), min(self.ttl.values()))
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def as_hit(result: dict) -> dict:
+        """Mark a result from get() as a cache hit (fresh timestamp, scoring time in cached_at)."""
+        result["cached"] = True
+        result["cached_at"] = result.get("timestamp")
+        result["timestamp"] = datetime.utcnow().isoformat() + "Z"
+        return result
+
+    def get_or_score(self, kind: str, u: str, score_fn, **params) -> dict:
+        """score_fn(u, **params) unless a fresh result is cached."""
+        key = self.key(kind, u, **params)
+        hit = self.get(key)
+        if hit is not None:
+            return self.as_hit(hit)
+        result = score_fn(u, **params)
+        self.set(key, result)
+        result["cached"] = False
+        return result
+
+    async def get_or_score_async(self, kind: str, u: str, score_fn, **params) -> dict:
+        """get_or_score for a coroutine score_fn (server.py's score_url_async)."""
+        key = self.key(kind, u, **params)
+        hit = self.get(key)
+        if hit is not None:
+            return self.as_hit(hit)
+        result = await score_fn(u, **params)
+        self.set(key, result)
+        result["cached"] = False
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "model_version": model_version(),
+                "rules_version": rules_version(),
+            }
+
+
+RESULT_CACHE = ResultCache()
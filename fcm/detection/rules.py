@@ -1,3 +1,8 @@
+# Bump whenever reasons/points change: part of every result-cache key (result_cache.py),
+# next to a hash of this file and engine.py that catches a forgotten bump
+# 2: punycode points only for lookalike hosts
+RULES_VERSION = 2
+
 def clamp(x, lo=0, hi=100): 
     return max(lo, min(hi, int(round(x))))
 
@@ -1,5 +1,11 @@
 import os
+import json
+import signal
+import argparse
+import threading
 from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import firebase_admin
 from firebase_admin import credentials, db
 import sys, os
@@ -7,7 +13,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import SERVICE_KEY_PATH, RTDB_URL, PATHS_IN, PATHS_OUT
 
-from detection.engine import score_url, score_app, score_content
+from detection.engine import score_urls, score_apps, score_contents
+from detection.push_id import generate_push_id
+from detection.config import PROBE_WORKERS
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_SIZE = int(os.environ.get("FCM_BATCH_CHUNK", 500))     # detections per multi-path update()
+CHECKPOINT_FILE = os.environ.get(
+    "FCM_BATCH_CHECKPOINT",
+    os.path.join(ROOT_DIR, "cache", "run_batch_checkpoint.json")
+)
+DAEMON_INTERVAL = float(os.environ.get("FCM_DAEMON_INTERVAL", 30))   # seconds between polls of each path
+DAEMON_WORKERS = int(os.environ.get("FCM_DAEMON_WORKERS", 6))        # input paths scored concurrently
 
 
 def init_firebase():
@@ -15,85 +32,265 @@ def init_firebase():
         cred = credentials.Certificate(SERVICE_KEY_PATH)
         firebase_admin.initialize_app(cred, {'databaseURL': RTDB_URL})
 
+# --- Checkpoint ---
+class Checkpoint:
+    """
+    Per input path: the last source key whose detection chunk is committed,
+    plus the chunk in flight (its last source key and the pre-generated output
+    push keys). A chunk interrupted between update() and commit() is rewritten
+    under the same keys on restart, so it overwrites instead of duplicating.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()    # daemon mode commits from several workers
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def _write(self):
+        """Caller holds self._lock, so no other worker changes state mid-dump."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def last_key(self, stream):
+        with self._lock:
+            return self.state.get(stream, {}).get("last_key")
+
+    def pending_keys(self, stream, chunk_last_key, n):
+        """Output keys reserved for this exact chunk by an interrupted run, else None."""
+        with self._lock:
+            pending = self.state.get(stream, {}).get("pending")
+            if pending and pending["last_key"] == chunk_last_key and len(pending["out_keys"]) == n:
+                return list(pending["out_keys"])
+        return None
+
+    def begin(self, stream, chunk_last_key, out_keys):
+        with self._lock:
+            self.state.setdefault(stream, {})["pending"] = {"last_key": chunk_last_key, "out_keys": list(out_keys)}
+            self._write()
+
+    def commit(self, stream, chunk_last_key, written):
+        with self._lock:
+            entry = self.state.setdefault(stream, {})
+            entry["last_key"] = chunk_last_key
+            entry["written"] = entry.get("written", 0) + written
+            entry["updated"] = datetime.utcnow().isoformat() + "Z"
+            entry.pop("pending", None)
+            self._write()
+
+# --- Read / write ---
 def read_list(path):
     """
-    Reads a list-like collection from RTDB.
-    Handles both arrays and push-key maps; normalizes to list of items (dicts or strings).
+    Reads a list-like collection from RTDB as [(key, item)] in key order.
+    Handles both arrays (key = index) and push-key maps (key = push key).
     """
     ref = db.reference(path)
     snap = ref.get()
-    out = []
-    if not snap: 
-        return out
+    if not snap:
+        return []
     if isinstance(snap, list):
-        out = [x for x in snap if x]
-    elif isinstance(snap, dict):
+        return [(i, x) for i, x in enumerate(snap) if x]
+    if isinstance(snap, dict):
         # values may be dicts with 'url' fields (your scripts push dicts)
-        for _, v in snap.items():
-            if v:
-                out.append(v)
-    return out
-
-def write_detection(kind: str, payload: dict):
-    out_path = PATHS_OUT[kind]
-    ref = db.reference(out_path)
-    ref.push(payload)
-
-def process_urls(tag: str, path_in: str):
-    items = read_list(path_in)
-    if not items:
-        print(f"[urls/{tag}] nothing to score")
-        return
-    print(f"[urls/{tag}] scoring {len(items)} items...")
-    for it in items:
-        u = it.get("url") if isinstance(it, dict) else str(it)
-        if not u: 
-            continue
-        det = score_url(u)
-        det["source_tag"] = tag
-        write_detection("url", det)
+        return [(k, v) for k, v in sorted(snap.items()) if v]
+    return []
 
-def process_apps(tag: str, path_in: str, platform="android"):
-    items = read_list(path_in)
-    if not items:
-        print(f"[apps/{tag}] nothing to score")
-        return
-    print(f"[apps/{tag}] scoring {len(items)} items...")
+def read_page(path, after_key, page_size):
+    """
+    Up to page_size [(key, item)] with keys after `after_key`, in key order,
+    fetched with an order_by_key() query so the tree is never pulled whole.
+    """
+    query = db.reference(path).order_by_key()
+    if after_key is not None:
+        query = query.start_at(str(after_key))   # inclusive: the cursor itself is dropped below
+    snap = query.limit_to_first(page_size + (after_key is not None)).get()
+    if not snap:
+        return []
+    pairs = snap.items() if isinstance(snap, dict) else enumerate(snap)
+    return [(k, v) for k, v in pairs if v and str(k) != str(after_key)][:page_size]
+
+def after_checkpoint(items, last_key):
+    """Items whose key sorts after the checkpointed one (push keys are chronological)."""
+    if last_key is None:
+        return items
+    return [(k, v) for k, v in items if type(k) is not type(last_key) or k > last_key]
+
+def write_detections(kind: str, keyed_payloads):
+    """One multi-path update() under PATHS_OUT[kind] for [(push_key, payload)]."""
+    if keyed_payloads:
+        db.reference(PATHS_OUT[kind]).update(dict(keyed_payloads))
+
+def item_url(it):
+    return it.get("url") if isinstance(it, dict) else str(it)
+
+def item_urls(items):
+    urls = []
     for it in items:
-        u = it.get("url") if isinstance(it, dict) else str(it)
-        if not u: 
-            continue
-        det = score_app(u, platform=platform)
+        u = item_url(it)
+        if u:
+            urls.append(u)
+    return urls
+
+def score_chunk(chunk, score_fn):
+    """
+    [(key, detection)] for the chunk's items that have a URL. Detections whose
+    network checks timed out ("partial") are rescored once; the pairs stop
+    before the first one still partial, and the flag says whether they did.
+    """
+    keyed = [(k, item_url(v)) for k, v in chunk]
+    keyed = [(k, u) for k, u in keyed if u]
+    dets = score_fn([u for _, u in keyed])
+    retry = [i for i, det in enumerate(dets) if det.get("partial")]
+    if retry:
+        for i, det in zip(retry, score_fn([keyed[i][1] for i in retry])):
+            dets[i] = det
+    for i, det in enumerate(dets):
+        if det.get("partial"):
+            return [(k, d) for (k, _), d in zip(keyed[:i], dets[:i])], keyed[i][0]
+    return [(k, d) for (k, _), d in zip(keyed, dets)], None
+
+def write_chunk(kind: str, tag: str, stream: str, chunk, score_fn, checkpoint: Checkpoint):
+    """
+    Score one chunk of [(key, item)], update() it, checkpoint it. Returns
+    (detections written, complete). A detection still partial after a retry
+    is not written: the chunk is cut just before it and the cursor stops
+    there, so the next run scores it again (complete is then False).
+    """
+    scored, stop_key = score_chunk(chunk, score_fn)
+    if stop_key is not None:
+        keys = [k for k, _ in chunk]
+        cut = keys.index(stop_key)
+        if cut == 0:
+            return 0, False
+        chunk = chunk[:cut]
+    chunk_last_key = chunk[-1][0]
+    dets = [det for _, det in scored]
+    for det in dets:
         det["source_tag"] = tag
-        write_detection("app", det)
+    out_keys = checkpoint.pending_keys(stream, chunk_last_key, len(dets)) \
+        or [generate_push_id() for _ in dets]
+    checkpoint.begin(stream, chunk_last_key, out_keys)
+    write_detections(kind, list(zip(out_keys, dets)))
+    checkpoint.commit(stream, chunk_last_key, len(dets))
+    return len(dets), stop_key is None
 
-def process_content(tag: str, path_in: str):
-    items = read_list(path_in)
+def process(kind: str, tag: str, path_in: str, score_fn, checkpoint: Checkpoint, chunk_size=None):
+    """Score items after the checkpoint chunk by chunk: score, update(), checkpoint."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    stream = f"{kind}:{path_in}"
+    items = after_checkpoint(read_list(path_in), checkpoint.last_key(stream))
     if not items:
-        print(f"[content/{tag}] nothing to score")
+        print(f"[{kind}/{tag}] nothing new to score")
         return
-    print(f"[content/{tag}] scoring {len(items)} items...")
-    for it in items:
-        u = it.get("url") if isinstance(it, dict) else str(it)
-        if not u: 
-            continue
-        det = score_content(u)
-        det["source_tag"] = tag
-        write_detection("content", det)
+    print(f"[{kind}/{tag}] scoring {len(items)} items in chunks of {chunk_size}...")
+    for start in range(0, len(items), chunk_size):
+        _, complete = write_chunk(kind, tag, stream, items[start:start + chunk_size], score_fn, checkpoint)
+        if not complete:
+            print(f"⚠️ [{kind}/{tag}] network probes timed out; stopped at the checkpoint, rerun to continue")
+            return
+        print(f"[{kind}/{tag}] {min(start + chunk_size, len(items))}/{len(items)} committed")
+
+def poll(kind: str, tag: str, path_in: str, score_fn, checkpoint: Checkpoint, page_size=None) -> int:
+    """Daemon step for one path: page through keys after the cursor until caught up."""
+    page_size = page_size or CHUNK_SIZE
+    stream = f"{kind}:{path_in}"
+    total = 0
+    while True:
+        page = read_page(path_in, checkpoint.last_key(stream), page_size)
+        if not page:
+            return total
+        written, complete = write_chunk(kind, tag, stream, page, score_fn, checkpoint)
+        total += written
+        if not complete or len(page) < page_size:   # timed-out probes: retried next interval
+            return total
+
+def process_urls(tag: str, path_in: str, checkpoint: Checkpoint):
+    process("url", tag, path_in, score_urls, checkpoint)
+
+def process_apps(tag: str, path_in: str, checkpoint: Checkpoint, platform="android"):
+    process("app", tag, path_in, lambda urls: score_apps(urls, platform=platform), checkpoint)
+
+def process_content(tag: str, path_in: str, checkpoint: Checkpoint):
+    process("content", tag, path_in, score_contents, checkpoint)
+
+# (kind, source_tag, PATHS_IN key, scorer)
+STREAMS = [
+    ("url", "banking", "banking_urls", score_urls),
+    ("url", "social_media", "social_urls", score_urls),
+    ("app", "banking", "banking_apps", lambda urls: score_apps(urls, platform="android")),
+    ("app", "social_media", "social_apps", lambda urls: score_apps(urls, platform="android")),
+    ("content", "banking", "banking_content", score_contents),
+    ("content", "social_media", "social_content", score_contents),
+]
+
+def run_daemon(checkpoint: Checkpoint, interval=DAEMON_INTERVAL, workers=DAEMON_WORKERS, stop=None):
+    """
+    Long-running mode: every `interval` seconds each input path is paged from
+    its checkpoint cursor on a worker pool, so only new items are read and
+    scored. (firebase_admin's listen() always begins with a full snapshot of
+    the tree, which is exactly what this avoids.) Stops on SIGINT/SIGTERM.
+    """
+    stop = stop or threading.Event()
+    workers = max(1, workers)
+    # URL streams polled at once share the PROBE_WORKERS probe threads, and a probe's
+    # deadline includes waiting for one: split the threads between them
+    url_streams = min(workers, sum(1 for kind, *_ in STREAMS if kind == "url"))
+    probes = max(1, PROBE_WORKERS // url_streams)
+    streams = [(kind, tag, key, partial(fn, concurrency=probes) if kind == "url" else fn)
+               for kind, tag, key, fn in STREAMS]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fcm-daemon") as pool:
+        while not stop.is_set():
+            futures = {pool.submit(poll, kind, tag, PATHS_IN[key], fn, checkpoint): f"{kind}/{tag}"
+                       for kind, tag, key, fn in streams}
+            for fut in as_completed(futures):
+                try:
+                    n = fut.result()
+                    if n:
+                        print(f"[{futures[fut]}] {n} new detections")
+                except Exception as e:
+                    print(f"⚠️ [{futures[fut]}] poll failed: {e}")
+            stop.wait(interval)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and rescore everything")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--daemon", action="store_true", help="Keep polling for new items after the cursor")
+    parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL)
+    parser.add_argument("--workers", type=int, default=DAEMON_WORKERS)
+    args = parser.parse_args()
+    CHUNK_SIZE = args.chunk_size
+
+    if args.fresh and os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+    checkpoint = Checkpoint()
+
     init_firebase()
 
+    if args.daemon:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        print(f"👀 Watching {len(STREAMS)} paths every {args.interval:g}s (Ctrl+C to stop)")
+        run_daemon(checkpoint, interval=args.interval, workers=args.workers, stop=stop)
+        print("✅ Daemon stopped.")
+        sys.exit(0)
+
     # URLs
-    process_urls("banking", PATHS_IN["banking_urls"])
-    process_urls("social_media", PATHS_IN["social_urls"])
+    process_urls("banking", PATHS_IN["banking_urls"], checkpoint)
+    process_urls("social_media", PATHS_IN["social_urls"], checkpoint)
 
     # Apps
-    process_apps("banking", PATHS_IN["banking_apps"], platform="android")
-    process_apps("social_media", PATHS_IN["social_apps"], platform="android")
+    process_apps("banking", PATHS_IN["banking_apps"], checkpoint, platform="android")
+    process_apps("social_media", PATHS_IN["social_apps"], checkpoint, platform="android")
 
     # Content
-    process_content("banking", PATHS_IN["banking_content"])
-    process_content("social_media", PATHS_IN["social_content"])
+    process_content("banking", PATHS_IN["banking_content"], checkpoint)
+    process_content("social_media", PATHS_IN["social_content"], checkpoint)
 
     print("✅ Batch detection complete.")
@@ -0,0 +1,114 @@
+# detection/tld.py
+"""
+Offline TLD / public-suffix data.
+
+The IANA TLD list and the public suffix list are bundled (versioned) in
+detection/data/, so importing or scoring never waits on the network.
+tldextract is imported and its suffix trie built on first use only.
+Set FCM_TLD_REFRESH=1 to refresh both lists in a background thread.
+"""
+import os
+import threading
+from functools import lru_cache
+
+MODULE_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(MODULE_DIR, "data")
+PSL_SNAPSHOT = os.path.join(DATA_DIR, "public_suffix_list.dat")
+TLD_SNAPSHOT = os.path.join(DATA_DIR, "tlds-alpha-by-domain.txt")
+
+IANA_TLD_URL = "https://data.iana.org/TLD/tlds-alpha-by-domain.txt"
+PSL_URL = "https://publicsuffix.org/list/public_suffix_list.dat"
+REFRESH = os.environ.get("FCM_TLD_REFRESH", "0") == "1"
+EXTRACT_CACHE_SIZE = int(os.environ.get("FCM_TLD_CACHE_SIZE", 65536))   # memoized extract() results
+
+FALLBACK_TLDS = {"com", "org", "net", "edu", "gov", "mil", "int", "info", "biz", "xyz", "ai", "in", "us", "uk", "de"}
+
+_lock = threading.Lock()
+_extractor = None
+_valid_tlds = None
+_refresh_started = False
+
+def _parse_tld_list(text: str) -> set:
+    return {line.strip().lower() for line in text.splitlines() if line.strip() and not line.startswith("#")}
+
+def tlds_from_psl(psl_text: str) -> set:
+    """Single-label TLDs (IDNs in xn-- form) from the ICANN section of a public suffix list."""
+    import idna
+    tlds = set()
+    for line in psl_text.split("// ===END ICANN DOMAINS===")[0].splitlines():
+        line = line.strip()
+        if not line or line.startswith("//") or "." in line:
+            continue
+        label = line.lstrip("*.!").lower()
+        try:
+            label = idna.encode(label).decode()
+        except Exception:
+            pass
+        tlds.add(label)
+    return tlds
+
+def load_valid_tlds(path: str = TLD_SNAPSHOT) -> set:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return _parse_tld_list(f.read())
+    except Exception as e:
+        print("⚠️ Could not read TLD snapshot", path, ":", e)
+        return set(FALLBACK_TLDS)
+
+def valid_tlds() -> set:
+    global _valid_tlds
+    if _valid_tlds is None:
+        with _lock:
+            if _valid_tlds is None:
+                _valid_tlds = load_valid_tlds()
+        _maybe_refresh()
+    return _valid_tlds
+
+def _build_extractor(psl_path: str = PSL_SNAPSHOT):
+    import tldextract
+    # Only the local file is consulted; the package's own snapshot is the fallback.
+    return tldextract.TLDExtract(cache_dir=None, suffix_list_urls=("file://" + os.path.abspath(psl_path),),
+                                 fallback_to_snapshot=True)
+
+def get_extractor():
+    global _extractor
+    if _extractor is None:
+        with _lock:
+            if _extractor is None:
+                _extractor = _build_extractor()
+        _maybe_refresh()
+    return _extractor
+
+@lru_cache(maxsize=EXTRACT_CACHE_SIZE)
+def extract(host_or_url: str):
+    """tldextract.extract() against the bundled suffix list (no network), LRU-cached."""
+    return get_extractor()(host_or_url)
+
+# ----- Optional background refresh -----
+def _refresh():
+    global _valid_tlds, _extractor
+    import requests
+    try:
+        resp = requests.get(IANA_TLD_URL, timeout=10)
+        resp.raise_for_status()
+        fresh = _parse_tld_list(resp.text)
+        if fresh:
+            _valid_tlds = fresh
+    except Exception as e:
+        print("⚠️ TLD list refresh failed:", e)
+    try:
+        import tldextract
+        fresh_extractor = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=(PSL_URL,),
+                                                fallback_to_snapshot=False)
+        fresh_extractor("example.com")   # forces the download
+        _extractor = fresh_extractor
+        extract.cache_clear()
+    except Exception as e:
+        print("⚠️ Public suffix list refresh failed:", e)
+
+def _maybe_refresh():
+    global _refresh_started
+    if not REFRESH or _refresh_started:
+        return
+    _refresh_started = True
+    threading.Thread(target=_refresh, name="fcm-tld-refresh", daemon=True).start()
@@ -0,0 +1,184 @@
+# detection/training_cache.py
+"""
+Replay reservoir for scripts/train_model.py, stored column by column.
+
+    training_cache/meta.json          columns, dtypes, rows, seen, capacity
+    training_cache/columns/<col>.npy  one typed array per feature column
+    training_cache/labels.npy         uint8
+
+Every file is a fixed-capacity .npy opened with mmap_mode, so offering new
+rows writes only the slots that change, and a replay sample reads only the
+rows it picks. Columns get the narrowest type that holds their values
+exactly (uint8 for flags and small counts, int16/int32 for lengths and hash
+buckets, float32 otherwise); a value that does not fit widens that one
+column. Encoded rows come from detection.encoder, so reading back as
+float32 gives the same matrix training used.
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from .config import TRAINING_CACHE_DIR
+
+# Storage types from narrow to wide; each holds every value of the ones before it
+_TYPES = [np.dtype(t) for t in (np.uint8, np.int16, np.int32, np.float32)]
+
+
+def fit_dtype(values: np.ndarray) -> np.dtype:
+    """Narrowest storage type that holds `values` exactly."""
+    if values.size == 0:
+        return _TYPES[0]
+    if np.all(np.isfinite(values)) and np.all(values == np.round(values)):
+        lo, hi = values.min(), values.max()
+        for t in _TYPES[:-1]:
+            info = np.iinfo(t)
+            if info.min <= lo and hi <= info.max:
+                return t
+    return _TYPES[-1]
+
+def _widen(current: np.dtype, needed: np.dtype) -> np.dtype:
+    return max(current, needed, key=_TYPES.index)
+
+
+class TrainingCache:
+    def __init__(self, root: str = TRAINING_CACHE_DIR, capacity: int = 5000):
+        self.root = root
+        self.meta_path = os.path.join(root, "meta.json")
+        self.meta = {"columns": [], "dtypes": {}, "rows": 0, "seen": 0, "capacity": max(1, capacity)}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def seen(self) -> int:
+        return self.meta["seen"]
+
+    @property
+    def capacity(self) -> int:
+        return self.meta["capacity"]
+
+    # --- files ---
+    def _path(self, col: str) -> str:
+        return os.path.join(self.root, "columns", f"{col}.npy")
+
+    def _labels_path(self) -> str:
+        return os.path.join(self.root, "labels.npy")
+
+    def _save_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, self.meta_path)
+
+    def _create(self, path: str, dtype, data=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mm = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.capacity,))
+        if data is not None:
+            mm[:len(data)] = data
+        mm.flush()
+        del mm
+
+    def _open(self, path: str, mode: str = "r+"):
+        return np.load(path, mmap_mode=mode)
+
+    def _ensure(self, col: str, values: np.ndarray):
+        """Create the column file, or widen it so `values` fit."""
+        needed = fit_dtype(values)
+        current = self.meta["dtypes"].get(col)
+        if current is None:
+            self._create(self._path(col), needed)
+            self.meta["columns"].append(col)
+            self.meta["dtypes"][col] = needed.name
+            return
+        wider = _widen(np.dtype(current), needed)
+        if wider != np.dtype(current):
+            old = np.array(self._open(self._path(col), "r"))
+            self._create(self._path(col), wider, old.astype(wider))
+            self.meta["dtypes"][col] = wider.name
+
+    # --- write ---
+    def write_rows(self, slots: np.ndarray, X: pd.DataFrame, y):
+        """X.iloc[i] and y[i] into slot slots[i] (repeated slots: the last one wins)."""
+        if not len(slots):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        for col in X.columns:
+            values = X[col].to_numpy(dtype=np.float32)
+            self._ensure(col, values)
+            mm = self._open(self._path(col))
+            mm[slots] = values.astype(mm.dtype)
+            mm.flush()
+            del mm
+        for col in self.meta["columns"]:
+            if col not in X.columns:    # dropped from the feature set: reads as 0, like frame()
+                mm = self._open(self._path(col))
+                mm[slots] = 0
+                mm.flush()
+                del mm
+        if not os.path.exists(self._labels_path()):
+            self._create(self._labels_path(), np.uint8)
+        mm = self._open(self._labels_path())
+        mm[slots] = np.asarray(y, dtype=np.uint8)
+        mm.flush()
+        del mm
+        self.meta["rows"] = max(self.rows, int(slots.max()) + 1)
+        self._save_meta()
+
+    def offer(self, X: pd.DataFrame, y, rng) -> int:
+        """
+        Algorithm R over all rows ever offered: free slots fill first, then each
+        new row replaces a random slot with probability capacity / seen.
+        Returns how many rows were written.
+        """
+        y = np.asarray(y)
+        seen, rows = self.seen, self.rows
+        slots, picked = [], []
+        for i in range(len(X)):
+            seen += 1
+            if rows < self.capacity:
+                slot, rows = rows, rows + 1
+            else:
+                slot = int(rng.integers(seen))
+                if slot >= self.capacity:
+                    continue
+            slots.append(slot)
+            picked.append(i)
+        self.meta["seen"] = seen
+        if picked:
+            self.write_rows(np.asarray(slots), X.iloc[picked], y[picked])
+        else:
+            self._save_meta()
+        return len(picked)
+
+    def import_frame(self, X: pd.DataFrame, y, seen: int, rng):
+        """Seed an empty cache from an (X, y) frame (old_training_data.pkl), downsampled to capacity."""
+        y = np.asarray(y)
+        if len(X) > self.capacity:
+            keep = np.sort(rng.choice(len(X), size=self.capacity, replace=False))
+            X, y = X.iloc[keep], y[keep]
+        self.meta["seen"] = max(seen, len(X))
+        self.write_rows(np.arange(len(X)), X, y)
+
+    # --- read ---
+    def frame(self, columns, rows=None):
+        """
+        (X, y) for the given slots (all when None) as float32 columns in
+        `columns` order; columns the cache does not have are zero.
+        """
+        rows = np.arange(self.rows) if rows is None else np.asarray(rows)
+        data = {}
+        for col in columns:
+            if col in self.meta["dtypes"]:
+                data[col] = np.asarray(self._open(self._path(col), "r")[rows], dtype=np.float32)
+            else:
+                data[col] = np.zeros(len(rows), dtype=np.float32)
+        labels = np.zeros(0, dtype=np.int64)
+        if len(rows):
+            labels = np.asarray(self._open(self._labels_path(), "r")[rows], dtype=np.int64)
+        return pd.DataFrame(data, columns=list(columns)), pd.Series(labels)
@@ -0,0 +1,286 @@
+# detection/write_behind.py
+"""
+Write-behind queue for detection records.
+
+Request handlers only submit() a record (a push key is assigned right away);
+a background thread drains the bounded queue in batches into a Sink, retrying
+failed batches with backoff. Records that do not fit in the queue, or whose
+batch keeps failing, are appended to a local spill file (JSON lines) and
+re-submitted on the next start. close() (also run at exit) drains what is
+left; if the worker is stuck in a write past the timeout, its batch and the
+rest of the queue are spilled instead.
+
+Sinks:
+  FirebaseSink  RTDB multi-location update() + Firestore batch writes
+  JSONLSink     append to a local .jsonl file
+  SQLiteSink    upsert into a local sqlite table
+Every write is keyed by the record's push key, so a retried batch overwrites
+instead of duplicating.
+"""
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+
+from .config import (
+    WRITE_QUEUE_SIZE, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL,
+    WRITE_MAX_RETRIES, WRITE_SPILL_PATH,
+)
+from .push_id import generate_push_id
+
+FIRESTORE_BATCH_LIMIT = 500   # Firestore's maximum writes per batch
+REPLAY_STALE = 60.0           # seconds before another process's replay claim is taken over
+
+
+def _age(path: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+# --- Sinks ---
+class Sink:
+    """write_batch([(key, record), ...]) must write all records or raise."""
+
+    def write_batch(self, items):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FirebaseSink(Sink):
+    def __init__(self, rtdb_root, firestore_client, rtdb_path="detections", collection="detections"):
+        self.rtdb_root = rtdb_root
+        self.firestore_client = firestore_client
+        self.rtdb_path = rtdb_path.strip("/")
+        self.collection = collection
+
+    def write_batch(self, items):
+        if self.rtdb_root is not None:
+            self.rtdb_root.update({f"{self.rtdb_path}/{key}": record for key, record in items})
+        if self.firestore_client is not None:
+            col = self.firestore_client.collection(self.collection)
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                batch = self.firestore_client.batch()
+                for key, record in items[start:start + FIRESTORE_BATCH_LIMIT]:
+                    batch.set(col.document(key), record)
+                batch.commit()
+
+
+class JSONLSink(Sink):
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write_batch(self, items):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for key, record in items:
+                f.write(json.dumps({"key": key, "record": record}, default=str) + "\n")
+
+
+class SQLiteSink(Sink):
+    def __init__(self, path: str, table: str = "detections"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.table = table
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self.db.commit()
+
+    def write_batch(self, items):
+        with self.db:
+            self.db.executemany(f"INSERT OR REPLACE INTO {self.table} (key, record) VALUES (?, ?)",
+                                [(key, json.dumps(record, default=str)) for key, record in items])
+
+    def close(self):
+        self.db.close()
+
+
+def sink_from_spec(spec: str, rtdb_root=None, firestore_client=None) -> Sink:
+    """'firebase', 'file:<path.jsonl>' or 'sqlite:<path.db>' (FCM_WRITE_SINK)."""
+    if spec.startswith("file:"):
+        return JSONLSink(spec[len("file:"):])
+    if spec.startswith("sqlite:"):
+        return SQLiteSink(spec[len("sqlite:"):])
+    return FirebaseSink(rtdb_root, firestore_client)
+
+
+# --- Queue ---
+class WriteBehindQueue:
+    def __init__(self, sink: Sink, max_queue=WRITE_QUEUE_SIZE, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL, max_retries=WRITE_MAX_RETRIES,
+                 spill_path=WRITE_SPILL_PATH, replay=True):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = False
+        self._inflight = None     # batch the worker is writing
+        self.written = 0
+        self.retries = 0
+        self.spilled = 0
+        self.failed_batches = 0
+
+        if replay:
+            self.replay_spill()
+        self._worker = threading.Thread(target=self._run, name="fcm-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, record: dict, key: str = None) -> str:
+        """Queue a record without blocking; returns its push key."""
+        key = key or generate_push_id()
+        if self._closed:
+            self._spill([(key, record)])
+            return key
+        try:
+            self._queue.put_nowait((key, record))
+        except queue.Full:
+            self._spill([(key, record)])
+        return key
+
+    # --- spill file ---
+    def _spill(self, items):
+        if not self.spill_path:
+            print(f"⚠️ Write-behind: dropping {len(items)} records (no spill file)")
+            return
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for key, record in items:
+                    f.write(json.dumps({"key": key, "record": record}, default=str) + "\n")
+        self.spilled += len(items)
+
+    def replay_spill(self) -> int:
+        """
+        Re-submit records spilled by an earlier run; returns how many. Each
+        file is first claimed by renaming it to a name of this process, so of
+        several worker processes starting at once only one replays it; claim
+        files left by a process that died mid-replay (see REPLAY_STALE) are
+        picked up first.
+        Records are keyed by push key, so replaying one twice only overwrites.
+        """
+        if not self.spill_path:
+            return 0
+        claimed = []
+        # A claim is touched when taken; one untouched for REPLAY_STALE seconds belongs
+        # to a process that died mid-replay (a replay only takes milliseconds)
+        leftovers = [p for p in sorted(glob.glob(glob.escape(self.spill_path) + ".replay*"))
+                     if _age(p) > REPLAY_STALE]
+        for path in leftovers + [self.spill_path]:
+            claim = f"{self.spill_path}.replay.{os.getpid()}.{len(claimed)}"
+            try:
+                with self._spill_lock:
+                    os.replace(path, claim)
+                os.utime(claim)
+            except OSError:    # missing, or claimed by another process first
+                continue
+            claimed.append(claim)
+        count = 0
+        for claim in claimed:
+            try:
+                with open(claim, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                        except ValueError:
+                            continue
+                        self.submit(row["record"], key=row["key"])
+                        count += 1
+                os.remove(claim)
+            except OSError as e:
+                print(f"⚠️ Write-behind: could not replay {claim}: {e}")
+        if count:
+            print(f"✅ Write-behind: re-queued {count} spilled records")
+        return count
+
+    # --- worker ---
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write_batch(batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"⚠️ Write-behind: batch of {len(batch)} failed after {attempt + 1} attempts: {e}")
+                    break
+                self.retries += 1
+                time.sleep(min(30.0, 0.5 * 2 ** attempt))
+        self.failed_batches += 1
+        self._spill(batch)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            self._inflight = batch
+            try:
+                self._write(batch)
+            finally:
+                self._inflight = None
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until everything submitted so far has been written or spilled."""
+        self._queue.join()
+
+    def close(self, timeout: float = 30.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._worker.join(timeout)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._worker.is_alive():
+            # Still inside write_batch (slow sink / retry backoff). The daemon thread dies
+            # with the interpreter, so its batch is spilled from here too (a batch that
+            # does land is only overwritten on replay, writes being keyed by push key);
+            # the sink stays open under it
+            leftover = list(self._inflight or ()) + leftover
+            print(f"⚠️ Write-behind: worker still writing after {timeout}s; "
+                  f"spilling {len(leftover)} records, sink left open")
+            if leftover:
+                self._spill(leftover)
+            return
+        if leftover:
+            self._spill(leftover)
+        self.sink.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "retries": self.retries,
+            "spilled": self.spilled,
+            "failed_batches": self.failed_batches,
+        }
@@ -1,13 +1,10 @@
-import json
-import os
 import random
 
-ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
-SCHEMA_FILE = os.path.join(ROOT_DIR, "schema.json")
+from detection.dataset import load_dataset
 
-# Load your existing schema
-with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
-    schema = json.load(f)
+# New entries are appended to the dataset; nothing already there is rewritten
+dataset = load_dataset()
+schema = {"urls": {}, "apps": {}, "content": {}}
 
 # --- Function to add legit entries ---
 def add_legit_entries(bucket, n=3):
@@ -72,8 +69,7 @@ def add_legit_entries(bucket, n=3):
 for b in ["urls", "apps", "content"]:
     add_legit_entries(b, n=3)
 
-# Save updated schema
-with open(SCHEMA_FILE, "w", encoding="utf-8") as f:
-    json.dump(schema, f, indent=2)
+# Append them to the dataset
+counts = dataset.append_schema(schema)
 
-print("✅ Added legit entries to schema.json")
+print(f"✅ Added legit entries to the dataset: {counts}")
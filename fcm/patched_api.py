@@ -4,7 +4,9 @@ patched_api.py
 A drop-in enhanced version of your FCM/fcm/api.py that:
  - Initializes Firebase Admin (RTDB + Firestore) from GOOGLE_APPLICATION_CREDENTIALS or local service key.
  - Runs your local detection engine (score_url/score_app/score_content).
- - Saves each detection to Realtime DB (/detections) and Firestore ('detections' collection).
+ - Saves each detection to Realtime DB (/detections) and Firestore ('detections' collection)
+   through a background write-behind queue (detection/write_behind.py), so handlers never wait on Firebase.
+   FCM_WRITE_SINK=file:<path> or sqlite:<path> writes locally instead (no Firebase credentials needed).
  - Returns JSON to the frontend (same shape as original).
 USAGE:
   - Place this file inside the FCM/fcm/ folder (next to api.py).
@@ -30,6 +32,9 @@ if BASE_DIR not in sys.path:
 # Import detection functions from your engine (same as original)
 try:
     from detection.engine import score_url, score_content, score_app
+    from detection.result_cache import RESULT_CACHE
+    from detection.write_behind import WriteBehindQueue, sink_from_spec
+    from detection.config import WRITE_SINK
 except Exception as e:
     # Helpful error message if import fails
     raise ImportError("Couldn't import detection.engine. Run this script from inside the FCM/fcm directory "
@@ -42,16 +47,22 @@ from firebase_admin import credentials, firestore, db as rtdb
 FIREBASE_SA = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", os.path.join(BASE_DIR, "scripts", "fcmfbskp.json"))
 FIREBASE_RTDB_URL = os.environ.get("FIREBASE_DB_URL", "https://fcm-app-40684-default-rtdb.firebaseio.com/")
 
-if not firebase_admin._apps:
-    if not os.path.exists(FIREBASE_SA):
-        raise FileNotFoundError(f"Service account JSON not found at {FIREBASE_SA}. Set GOOGLE_APPLICATION_CREDENTIALS.")
-    cred = credentials.Certificate(FIREBASE_SA)
-    firebase_admin.initialize_app(cred, {
-        "databaseURL": FIREBASE_RTDB_URL
-    })
+firestore_client = None
+rtdb_root = None
+if WRITE_SINK == "firebase":
+    if not firebase_admin._apps:
+        if not os.path.exists(FIREBASE_SA):
+            raise FileNotFoundError(f"Service account JSON not found at {FIREBASE_SA}. Set GOOGLE_APPLICATION_CREDENTIALS.")
+        cred = credentials.Certificate(FIREBASE_SA)
+        firebase_admin.initialize_app(cred, {
+            "databaseURL": FIREBASE_RTDB_URL
+        })
 
-firestore_client = firestore.client()
-rtdb_root = rtdb.reference("/")  # root ref
+    firestore_client = firestore.client()
+    rtdb_root = rtdb.reference("/")  # root ref
+
+# Detections are written in batches by a background thread (flushed at exit)
+WRITE_QUEUE = WriteBehindQueue(sink_from_spec(WRITE_SINK, rtdb_root=rtdb_root, firestore_client=firestore_client))
 
 app = Flask(__name__)
 CORS(app)
@@ -59,7 +70,8 @@ CORS(app)
 
 def _save_detection(url, category, result):
     """
-    Save detection result to both RTDB and Firestore.
+    Queue a detection for RTDB (/detections/<push key>) and Firestore
+    ('detections/<push key>'); returns the push key. Never blocks on Firebase.
     category: 'url' / 'app' / 'content' - useful to separate later
     """
     payload = {
@@ -68,18 +80,7 @@ def _save_detection(url, category, result):
         "result": result,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
-    # RTDB push
-    try:
-        detections_ref = rtdb_root.child("detections")
-        detections_ref.push(payload)
-    except Exception as e:
-        app.logger.warning("Failed to write to RTDB: %s", e)
-
-    # Firestore write
-    try:
-        firestore_client.collection("detections").add(payload)
-    except Exception as e:
-        app.logger.warning("Failed to write to Firestore: %s", e)
+    return WRITE_QUEUE.submit(payload)
 
 
 # --- Detect URL ---
@@ -90,8 +91,8 @@ def detect_url():
     if not url:
         return jsonify({"error": "Missing 'url' parameter"}), 400
 
-    # Run detection engine
-    result = score_url(url)
+    # Run detection engine (repeat submissions are answered from the result cache)
+    result = RESULT_CACHE.get_or_score("url", url, score_url, sector="general")
 
     # Save to Firebase (RTDB + Firestore) for history/audit
     try:
@@ -117,9 +118,13 @@ def detect_app():
     if not app_info:
         return jsonify({"error": "Missing 'app_info'"}), 400
 
-    result = score_app(app_info)
+    # app_info is either the app link itself or {"url": ..., "package": ...}
+    app_url = app_info.get("url") if isinstance(app_info, dict) else app_info
+    if not app_url:
+        return jsonify({"error": "Missing 'url' in 'app_info'"}), 400
+    result = RESULT_CACHE.get_or_score("app", app_url, score_app, platform="android", sector="general")
     try:
-        _save_detection(app_info.get("url") or app_info.get("package") or "<unknown>", "app", result)
+        _save_detection(app_url, "app", result)
     except Exception as e:
         app.logger.error("Error saving detection: %s", e)
 
@@ -134,7 +139,7 @@ def detect_content():
     if not url:
         return jsonify({"error": "Missing 'url' parameter"}), 400
 
-    result = score_content(url)
+    result = RESULT_CACHE.get_or_score("content", url, score_content, sector="general")
     try:
         _save_detection(url, "content", result)
     except Exception as e:
@@ -143,8 +148,18 @@ def detect_content():
     return jsonify({"url": url, "result": result}), 200
 
 
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(RESULT_CACHE.stats()), 200
+
+
+@app.route("/writes/stats", methods=["GET"])
+def write_stats():
+    return jsonify(WRITE_QUEUE.stats()), 200
+
+
 if __name__ == "__main__":
     # Helpful startup log
     print("Starting patched API on http://0.0.0.0:5000")
-    print("Using service account:", FIREBASE_SA)
+    print("Using service account:", FIREBASE_SA if WRITE_SINK == "firebase" else f"(none, sink {WRITE_SINK})")
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=True)
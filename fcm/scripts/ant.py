@@ -1,11 +1,12 @@
 # scripts/add_and_train.py
 import os
-import json
 import subprocess
 import sys
 
-ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
-SCHEMA_FILE = os.path.join(ROOT_DIR, "schema.json")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from detection.dataset import load_dataset
 
 # --- New data to add ---
 new_urls = {
@@ -23,22 +24,9 @@ new_urls = {
     "content": {}
 }
 
-# --- Load existing schema ---
-if os.path.exists(SCHEMA_FILE):
-    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
-        schema = json.load(f)
-else:
-    schema = {"urls": {}, "apps": {}, "content": {}}
-
-# --- Merge new data ---
-for bucket in ["urls", "apps", "content"]:
-    schema.setdefault(bucket, {})
-    schema[bucket].update(new_urls.get(bucket, {}))
-
-# --- Save updated schema ---
-with open(SCHEMA_FILE, "w", encoding="utf-8") as f:
-    json.dump(schema, f, indent=2)
-print("✅ New test URLs added to schema.json")
+# --- Append to the dataset (existing parts are left untouched) ---
+counts = load_dataset().append_schema(new_urls)
+print(f"✅ New test URLs added to the dataset: {counts}")
 
 # --- Trigger training ---
 print("⏳ Running train_model.py...")
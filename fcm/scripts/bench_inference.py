@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: sklearn XGBClassifier.predict_proba vs native Booster.inplace_predict.
+
+    python scripts/bench_inference.py
+    python scripts/bench_inference.py --rows 2000 --batch-sizes 1 32 512 4096 --threads 1 4
+
+Feature rows are built by running the content/app extractors over data/feed.txt
+(no network) and encoding them with detection.encoder, so both paths score
+the same float32 matrix.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import numpy as np
+from xgboost import XGBClassifier
+
+from detection.encoder import encode_batch, load_feature_columns
+from detection.features_app import extract_app_features
+from detection.features_content import extract_content_features
+from detection.inference import load_booster
+
+MODEL_PATH = os.path.join(ROOT_DIR, "xgboost_model.json")
+FEED_FILE = os.path.join(ROOT_DIR, "data", "feed.txt")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=1000, help="Single-row predictions to time")
+parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096])
+parser.add_argument("--threads", type=int, nargs="+", default=[1])
+parser.add_argument("--repeat", type=int, default=20, help="Repetitions per batch size")
+args = parser.parse_args()
+
+# --- Build feature matrix ---
+columns = load_feature_columns()
+with open(FEED_FILE, "r", encoding="utf-8") as f:
+    urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+features = [extract_content_features(u) for u in urls] + [extract_app_features(u) for u in urls]
+base = encode_batch(features, columns)
+max_batch = max(args.batch_sizes + [args.rows])
+X = base[np.arange(max_batch) % len(base)]
+print(f"Feature pool: {len(base)} rows x {len(columns)} columns (tiled to {len(X)})")
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+def summary(samples, rows):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {p50:9.1f} µs  p99 {p99:9.1f} µs  {rows / (p50 / 1e6):12,.0f} rows/s"
+
+for nthread in args.threads:
+    sk = XGBClassifier(n_jobs=nthread)
+    sk.load_model(MODEL_PATH)
+    native = load_booster(MODEL_PATH, nthread=nthread)
+
+    assert np.allclose(sk.predict_proba(X[:256])[:, 1], native.predict_positive(X[:256]), atol=1e-6), \
+        "native and sklearn predictions differ"
+
+    print(f"\n=== nthread={nthread} ===")
+    print(f"-- per row ({args.rows} calls) --")
+    rows = [X[i:i + 1] for i in range(args.rows)]
+    it = iter(rows)
+    print("  sklearn predict_proba  ", summary(timed(lambda: sk.predict_proba(next(it)), args.rows), 1))
+    it = iter(rows)
+    print("  booster inplace_predict", summary(timed(lambda: native.predict_positive(next(it)), args.rows), 1))
+
+    print("-- per batch --")
+    for bs in args.batch_sizes:
+        batch = np.ascontiguousarray(X[:bs])
+        print(f"  [{bs:5d}] sklearn predict_proba  ", summary(timed(lambda: sk.predict_proba(batch), args.repeat), bs))
+        print(f"  [{bs:5d}] booster inplace_predict", summary(timed(lambda: native.predict_positive(batch), args.repeat), bs))
@@ -0,0 +1,58 @@
+"""
+Compile Unicode confusables.txt (UTS #39) into detection/data/confusables.json.
+
+    python scripts/build_confusables.py                          # downloads the latest confusables.txt
+    python scripts/build_confusables.py --source confusables.txt # use a local copy
+
+The output maps every source code point straight to its final prototype
+(NFD-decomposed, combining marks removed) plus every combining mark to "",
+so detection/confusables.py can build a skeleton with one str.translate().
+"""
+import os
+import sys
+import json
+import argparse
+import unicodedata
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_FILE = os.path.join(ROOT_DIR, "detection", "data", "confusables.json")
+SOURCE_URL = "https://www.unicode.org/Public/security/latest/confusables.txt"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--source", help="Path to a local confusables.txt")
+args = parser.parse_args()
+
+if args.source:
+    with open(args.source, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+else:
+    import requests
+    resp = requests.get(SOURCE_URL, timeout=30)
+    resp.raise_for_status()
+    text = resp.content.decode("utf-8-sig")
+
+version = "unknown"
+raw = {}
+for line in text.splitlines():
+    if line.startswith("# Version:"):
+        version = line.split(":", 1)[1].strip()
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        continue
+    src, target = [p.strip() for p in line.split(";")[:2]]
+    raw[chr(int(src, 16))] = "".join(chr(int(cp, 16)) for cp in target.split())
+
+def strip_marks(s: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
+
+mapping = {}
+for cp in range(sys.maxunicode + 1):
+    ch = chr(cp)
+    if unicodedata.category(ch) == "Mn":
+        mapping[f"{cp:X}"] = ""
+for src, target in raw.items():
+    mapping[f"{ord(src):X}"] = strip_marks(target)
+
+with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    json.dump({"version": version, "map": mapping}, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+print(f"✅ {len(raw)} confusables (Unicode {version}) + combining marks -> {OUTPUT_FILE}")
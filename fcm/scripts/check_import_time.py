@@ -0,0 +1,53 @@
+"""
+Measure cold import time of the detection package against a budget.
+
+    python scripts/check_import_time.py                      # detection.engine, 500 ms budget
+    python scripts/check_import_time.py --budget-ms 300 detection.features_content
+
+Each module is imported in a fresh interpreter with `-X importtime`; the
+slowest imports are listed and the exit code is 1 if any module is over budget.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument("modules", nargs="*", default=["detection.engine"])
+parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("FCM_IMPORT_BUDGET_MS", 500)))
+parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to show")
+args = parser.parse_args()
+
+def measure(module: str):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise SystemExit(f"❌ import {module} failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    import_ms = next((c for c, _, n in rows if n.strip() == module), 0) / 1000
+    return wall_ms, import_ms, rows
+
+failed = False
+for module in args.modules:
+    wall_ms, import_ms, rows = measure(module)
+    ok = import_ms <= args.budget_ms
+    failed |= not ok
+    print(f"{'✅' if ok else '❌'} {module}: import {import_ms:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms), interpreter wall {wall_ms:.0f} ms")
+    for cumulative_us, self_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"    {self_us / 1000:8.1f} ms self  {cumulative_us / 1000:8.1f} ms cumulative  {name.strip()}")
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,25 @@
+import os
+import sys
+import argparse
+
+# Project root (one level up from scripts/)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from detection.dataset import BUCKETS, load_dataset
+
+# Writes the legacy schema.json layout ({bucket: {id: record}}) from the
+# append-only dataset, for tools that still read schema.json.
+parser = argparse.ArgumentParser()
+parser.add_argument("--output", default=os.path.join(ROOT_DIR, "schema.json"))
+parser.add_argument("--compact", action="store_true",
+                    help="Also fold each bucket's parts down to one record per id")
+args = parser.parse_args()
+
+dataset = load_dataset()
+if args.compact:
+    for bucket in BUCKETS:
+        print(f"{bucket}: {dataset.compact(bucket)} records after compaction")
+
+counts = dataset.export_schema(args.output)
+print(f"✅ Exported {sum(counts.values())} entries to {args.output}: {counts}")
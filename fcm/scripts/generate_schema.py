@@ -1,20 +1,19 @@
 import sys
 import os
-import json
 
 # ---- Add root folder to sys.path BEFORE imports ----
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT_DIR)
 
-from process_feeds import process_files
-from detection.engine import score_url, score_app, score_content
+from process_feeds import process_files, reset_journal
+from detection.dataset import BUCKETS, load_dataset
 
-# ---- Process all files in data/ folder ----
-schema = process_files()
+# ---- Process all files in data/ folder (ids already in the dataset are skipped) ----
+dataset = load_dataset()
+schema = process_files(known={b: dataset.ids(b) for b in BUCKETS})
 
-# ---- Save fully populated schema.json ----
-OUTPUT_FILE = os.path.join(ROOT_DIR, "schema.json")
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(schema, f, indent=2)
+# ---- Append to the dataset (scripts/export_schema.py writes schema.json from it) ----
+counts = dataset.append_schema(schema)
+reset_journal()   # results are safely on disk; the next run starts fresh
 
-print(f"schema.json created at {OUTPUT_FILE} with all URLs, apps, and content!")
+print(f"Appended {counts} URLs, apps and content to {dataset.root}")
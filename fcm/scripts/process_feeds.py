@@ -2,28 +2,38 @@ import os
 import json
 import glob
 import sys
+import argparse
 from datetime import datetime
 from time import time
-from detection.engine import score_url, score_app, score_content
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+from detection.engine import score_url, score_app, score_content, score_urls, score_apps, score_contents
+from detection.keywords import detect_sector
+from detection.config import PROBE_WORKERS
+from detection.dataset import load_dataset
+from detection.feature_store import FEATURE_STORE
+from detection.bloom import load_trained_set
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT_DIR)
 
-# Load sector keywords
-SECTOR_FILE = os.path.join(ROOT_DIR, "sectors.json")
-with open(SECTOR_FILE, "r") as f:
-    SECTOR_KEYWORDS = json.load(f)
-
-# Load trained URLs to skip
-TRAINED_FILE = os.path.join(ROOT_DIR, "trained_urls.json")
-if os.path.exists(TRAINED_FILE):
-    with open(TRAINED_FILE, "r", encoding="utf-8") as f:
-        trained_urls = set(json.load(f))
-else:
-    trained_urls = set()
+# Trained URLs to skip (on-disk Bloom filter; lookups read only the bits they need)
+trained_urls = load_trained_set()
 
 DATA_DIR = "data"
-OUTPUT_FILE = "schema.json"
+
+FEED_WORKERS = int(os.environ.get("FCM_FEED_WORKERS", 4))     # chunks scored concurrently
+# entries per score_entries() call; every chunk probes its URLs concurrently on the
+# shared probe pool, so workers * chunk should stay within PROBE_WORKERS or probes
+# queue behind each other and run into their deadline
+FEED_CHUNK = int(os.environ.get("FCM_FEED_CHUNK", max(1, PROBE_WORKERS // max(1, FEED_WORKERS))))
+JOURNAL_FILE = os.environ.get(
+    "FCM_FEED_JOURNAL",
+    os.path.join(ROOT_DIR, "cache", "process_feeds_journal.jsonl")
+)
+
+# classify_type() value -> schema bucket
+BUCKETS = {"url": "urls", "app": "apps", "content": "content"}
 
 # -------- Helper: classify file type ----------
 def classify_type(url: str) -> str:
@@ -36,70 +46,73 @@ def classify_type(url: str) -> str:
         return "url"
 
 # -------- Detect sector ----------
-def detect_sector(url: str) -> str:
-    u = url.lower()
-    for sector, keywords in SECTOR_KEYWORDS.items():
-        if any(k in u for k in keywords):
-            return sector
-    return "general"
-
-# -------- Process URLHAUS ----------
-def process_urlhaus(file_path: str) -> dict:
-    results = {"urls": {}, "apps": {}, "content": {}}
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-        return results
-
-    for _, entries in data.items():
-        for entry in entries:
-            url = entry.get("url")
-            threat = entry.get("threat", "unknown")
-            if not url or url in trained_urls:  # skip already trained
-                continue
+# detect_sector() comes from detection.keywords: sectors.json is compiled into the
+# shared keyword matcher, so the sector and feature keywords share one scan per URL.
+
+# -------- Batch scoring ----------
+def score_entries(entries) -> list:
+    """
+    entries: list of (url, typ, sector). Scores each type with one batch call and
+    returns results aligned with `entries` (None where scoring failed). If a
+    batch raises, its items are retried one by one so one bad URL only loses itself.
+    """
+    results = [None] * len(entries)
+    # Batch calls go through the feature store: known URLs are not probed or re-extracted
+    batch_fns = {
+        "url": lambda us, ss: score_urls(us, sector=ss, store=FEATURE_STORE),
+        "app": lambda us, ss: score_apps(us, platform="android", sector=ss, store=FEATURE_STORE),
+        "content": lambda us, ss: score_contents(us, sector=ss, store=FEATURE_STORE),
+    }
+    single_fns = {
+        "url": lambda u, s: score_url(u, sector=s),
+        "app": lambda u, s: score_app(u, platform="android", sector=s),
+        "content": lambda u, s: score_content(u, sector=s),
+    }
+    for typ, batch_fn in batch_fns.items():
+        idx = [i for i, e in enumerate(entries) if e[1] == typ]
+        if not idx:
+            continue
+        urls = [entries[i][0] for i in idx]
+        sectors = [entries[i][2] for i in idx]
+        try:
+            for i, result in zip(idx, batch_fn(urls, sectors)):
+                results[i] = result
+        except Exception as e:
+            print(f"Batch scoring failed ({e}); retrying {len(idx)} {typ} items one by one")
+            for i, u, sec in zip(idx, urls, sectors):
+                try:
+                    results[i] = single_fns[typ](u, sec)
+                except Exception as e:
+                    print(f"Error scoring URL {u}: {e}")
+    return results
 
-            sector = detect_sector(url)
-            typ = classify_type(url)
+# -------- Readers: (url, type, sector, metadata) per entry, no scoring ----------
+def read_urlhaus(file_path: str) -> list:
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
 
-            try:
-                if typ == "app":
-                    result = score_app(url, platform="android", sector=sector)
-                elif typ == "content":
-                    result = score_content(url, sector=sector)
-                else:
-                    result = score_url(url, sector=sector)
-            except Exception as e:
-                print(f"Error scoring URL {url}: {e}")
+    entries = []
+    for _, items in data.items():
+        for entry in items:
+            url = entry.get("url")
+            if not url:
                 continue
-
-            result.update({
-                "sector": sector,
-                "threat_label": threat,
+            entries.append((url, classify_type(url), detect_sector(url), {
+                "threat_label": entry.get("threat", "unknown"),
                 "source": "urlhaus",
                 "file_name": os.path.basename(file_path),
                 "file_type": "json",
-                "collected_at": datetime.utcnow().isoformat() + "Z"
-            })
+            }))
+    return entries
 
-            results[typ + "s"][url] = result
-
-    return results
-
-# -------- Process ADBLOCK ----------
-def process_adblock(file_path: str) -> dict:
-    results = {"urls": {}, "apps": {}, "content": {}}
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-        return results
+def read_adblock(file_path: str) -> list:
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
 
+    entries = []
     for line in lines:
         line = line.strip()
-        if not line or line.startswith("!") or line in trained_urls:
+        if not line or line.startswith("!"):
             continue
 
         if line.startswith("||") and "^" in line:
@@ -108,104 +121,167 @@ def process_adblock(file_path: str) -> dict:
             domain = line
 
         url = domain if domain.startswith("http") else f"http://{domain}"
-        sector = detect_sector(url)
-
-        try:
-            result = score_url(url, sector=sector)
-        except Exception as e:
-            print(f"Error scoring URL {url}: {e}")
-            continue
-
-        result.update({
-            "sector": sector,
+        entries.append((url, "url", detect_sector(url), {
             "threat_label": "phishing",
             "source": "adblock",
             "file_name": os.path.basename(file_path),
             "file_type": "adblock",
-            "collected_at": datetime.utcnow().isoformat() + "Z"
-        })
+        }))
+    return entries
 
-        results["urls"][url] = result
-
-    return results
-
-# -------- Process Feed TXT ----------
-def process_feed(file_path: str) -> dict:
-    results = {"urls": {}, "apps": {}, "content": {}}
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-        return results
+def read_feed(file_path: str) -> list:
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
 
+    entries = []
     for line in lines:
         url = line.strip()
-        if not url or url.startswith("#") or url in trained_urls:
+        if not url or url.startswith("#"):
             continue
+        entries.append((url, classify_type(url), detect_sector(url), {
+            "threat_label": "phishing",
+            "source": "feed.txt",
+            "file_name": os.path.basename(file_path),
+            "file_type": "txt",
+        }))
+    return entries
+
+def reader_for(filename: str):
+    if filename.endswith(".json") and "urlhaus" in filename:
+        return read_urlhaus
+    if "adblock" in filename:
+        return read_adblock
+    if filename.endswith(".txt"):
+        return read_feed
+    return None
+
+# -------- Progress journal ----------
+# One JSON line per scored entry ({"url", "bucket", "result"}), appended as
+# chunks finish. A rerun loads it and only scores what is missing; it is
+# removed once the results are in the dataset (reset_journal()).
+def load_journal(path: str = JOURNAL_FILE) -> dict:
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue    # torn last line from an interrupted run
+            done[row["url"]] = (row["bucket"], row["result"])
+    return done
 
-        sector = detect_sector(url)
-        typ = classify_type(url)
+def reset_journal(path: str = JOURNAL_FILE):
+    if os.path.exists(path):
+        os.remove(path)
 
+# -------- Master Pipeline ----------
+def collect_entries(files, known=None) -> list:
+    """
+    Entries of every file, deduplicated across files: a URL keeps its first
+    position and takes its last file's entry (as schema[bucket].update() did).
+    URLs already trained on, or already in `known` ({bucket: ids}), are skipped.
+    """
+    known = known or {}
+    latest, skipped = {}, 0
+    for idx, file_path in enumerate(files, 1):
+        filename = os.path.basename(file_path).lower()
+        reader = reader_for(filename)
+        if reader is None:
+            print(f"[{idx}/{len(files)}] Skipping unknown file format: {filename}")
+            continue
         try:
-            if typ == "app":
-                result = score_app(url, platform="android", sector=sector)
-            elif typ == "content":
-                result = score_content(url, sector=sector)
-            else:
-                result = score_url(url, sector=sector)
+            file_entries = reader(file_path)
         except Exception as e:
-            print(f"Error scoring URL {url}: {e}")
+            print(f"Error reading {file_path}: {e}")
+            continue
+        fresh = [e for e in file_entries
+                 if e[0] not in trained_urls and e[0] not in known.get(BUCKETS[e[1]], ())]
+        skipped += len(file_entries) - len(fresh)
+        for e in fresh:
+            latest[e[0]] = e
+        print(f"[{idx}/{len(files)}] {len(fresh)} entries from {filename} "
+              f"({len(file_entries) - len(fresh)} already trained or in the dataset)")
+    print(f"{len(latest)} unique entries to score ({skipped} skipped)")
+    return list(latest.values())
+
+def score_chunk(chunk) -> list:
+    """[(url, bucket, result)] for one chunk; failed entries are left out."""
+    scored = []
+    pending = [(url, typ, sector) for url, typ, sector, _ in chunk]
+    for (url, typ, sector, meta), result in zip(chunk, score_entries(pending)):
+        if result is None:
             continue
-
         result.update({
             "sector": sector,
-            "threat_label": "phishing",
-            "source": "feed.txt",
-            "file_name": os.path.basename(file_path),
-            "file_type": "txt",
+            **meta,
             "collected_at": datetime.utcnow().isoformat() + "Z"
         })
-
-        results[typ + "s"][url] = result
-
-    return results
-
-# -------- Master Pipeline ----------
-def process_files() -> dict:
+        scored.append((url, BUCKETS[typ], result))
+    return scored
+
+def process_files(resume: bool = True, workers: int = None, chunk_size: int = None, known=None) -> dict:
+    """
+    Reads every file in DATA_DIR, deduplicates URLs across files and scores them
+    in chunks on a bounded worker pool, journaling each finished chunk so an
+    interrupted run resumes where it stopped (resume=False starts over).
+    Ids in `known` ({bucket: ids}, e.g. already in the dataset) are not scored.
+    """
+    workers = max(1, workers or FEED_WORKERS)
+    chunk_size = max(1, chunk_size or FEED_CHUNK)
+    if workers * chunk_size > PROBE_WORKERS:
+        print(f"⚠️ {workers} workers x {chunk_size} entries exceeds the {PROBE_WORKERS} probe threads; "
+              f"expect probe timeouts")
     schema = {"urls": {}, "apps": {}, "content": {}}
-    total_entries = 0
     start_time = time()
 
-    files = glob.glob(os.path.join(DATA_DIR, "*"))
+    files = sorted(glob.glob(os.path.join(DATA_DIR, "*")))
     print(f"Found {len(files)} files in {DATA_DIR}")
-
-    for idx, file_path in enumerate(files, 1):
-        filename = os.path.basename(file_path).lower()
-        file_start = time()
-
-        try:
-            if filename.endswith(".json") and "urlhaus" in filename:
-                res = process_urlhaus(file_path)
-            elif "adblock" in filename:
-                res = process_adblock(file_path)
-            elif filename.endswith(".txt"):
-                res = process_feed(file_path)
-            else:
-                print(f"[{idx}/{len(files)}] Skipping unknown file format: {filename}")
-                continue
-
-            for bucket in ["urls", "apps", "content"]:
-                schema[bucket].update(res[bucket])
-
-            file_entries = sum(len(v) for v in res.values())
-            total_entries += file_entries
-            elapsed = time() - file_start
-            print(f"[{idx}/{len(files)}] Processed {file_entries} entries from {filename} in {elapsed:.2f}s (Total so far: {total_entries})")
-
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
-
+    entries = collect_entries(files, known)
+
+    if not resume:
+        reset_journal()
+    done = load_journal()
+    todo = []
+    for entry in entries:
+        if entry[0] in done:
+            bucket, result = done[entry[0]]
+            schema[bucket][entry[0]] = result
+        else:
+            todo.append(entry)
+    if done:
+        print(f"Resuming: {len(entries) - len(todo)} entries already scored in {JOURNAL_FILE}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(JOURNAL_FILE)), exist_ok=True)
+    chunks = (todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size))
+    with open(JOURNAL_FILE, "a", encoding="utf-8") as journal, \
+            ThreadPoolExecutor(max_workers=workers) as pool, \
+            tqdm(total=len(todo), desc="Scoring feeds", unit="url") as bar:   # live rate + ETA
+
+        def collect(futures):
+            for fut in futures:
+                n = pending.pop(fut)
+                try:
+                    scored = fut.result()
+                except Exception as e:
+                    print(f"Error scoring chunk: {e}")
+                    scored = []
+                for url, bucket, result in scored:
+                    schema[bucket][url] = result
+                    journal.write(json.dumps({"url": url, "bucket": bucket, "result": result}, default=str) + "\n")
+                journal.flush()
+                bar.update(n)
+
+        pending = {}
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending[pool.submit(score_chunk, chunk)] = len(chunk)
+        collect(list(pending))
+
+    total_entries = sum(len(v) for v in schema.values())
     total_elapsed = time() - start_time
     print(f"\nAll files processed. Total entries: {total_entries}. Time taken: {total_elapsed:.2f}s")
 
@@ -213,11 +289,19 @@ def process_files() -> dict:
 
 # -------- Run as script ----------
 if __name__ == "__main__":
-    schema = process_files()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fresh", action="store_true", help="Ignore the progress journal and rescore everything")
+    parser.add_argument("--workers", type=int, default=FEED_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=FEED_CHUNK)
+    args = parser.parse_args()
+
+    dataset = load_dataset()
+    # Ids already in the dataset are skipped, so re-running over the same feeds adds nothing
+    known = {b: dataset.ids(b) for b in BUCKETS.values()}
+    schema = process_files(resume=not args.fresh, workers=args.workers, chunk_size=args.chunk_size, known=known)
     try:
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(schema, f, indent=2)
-        total = sum(len(v) for v in schema.values())
-        print(f"\nFinal schema.json saved with {total} total entries")
+        counts = dataset.append_schema(schema)   # new part files only, nothing rewritten
+        reset_journal()
+        print(f"\nAppended {sum(counts.values())} entries to {dataset.root}: {counts}")
     except Exception as e:
-        print(f"Error writing {OUTPUT_FILE}: {e}")
+        print(f"Error appending to the dataset: {e}")
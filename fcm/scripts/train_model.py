@@ -1,8 +1,10 @@
 from tqdm import tqdm
+import numpy as np
 import pandas as pd
 import json
 import os
-from xgboost import XGBClassifier
+import time
+from xgboost import XGBClassifier, Booster
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from collections import Counter
@@ -15,16 +17,27 @@ import argparse
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--force", action="store_true", help="Force full retrain")
+parser.add_argument("--rounds", type=int, default=50, help="Boosting rounds added to the saved model")
+parser.add_argument("--replay", type=int, default=2000, help="Reservoir rows replayed next to the new ones")
+parser.add_argument("--device", default="cpu", help="XGBoost device: cpu or cuda")
+parser.add_argument("--refresh-columns", action="store_true",
+                    help="Derive feature columns from the data instead of feature_columns.json")
 args = parser.parse_args()
 
 # --- Paths ---
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SCHEMA_FILE = os.path.join(ROOT_DIR, "schema.json")
 MODEL_FILE_JSON = os.path.join(ROOT_DIR, "xgboost_model.json")
 FEATURES_FILE_JSON = os.path.join(ROOT_DIR, "feature_columns.json")
-TRAINED_URLS_FILE = os.path.join(ROOT_DIR, "trained_urls.json")
-OLD_DATA_FILE = os.path.join(ROOT_DIR, "old_training_data.pkl")
-MAX_OLD_SAMPLES = 5000
+OLD_DATA_FILE = os.path.join(ROOT_DIR, "old_training_data.pkl")   # legacy reservoir, imported once
+MAX_OLD_SAMPLES = 5000   # replay reservoir capacity
+
+def peak_rss_mb() -> str:
+    try:
+        import resource
+    except ImportError:   # Windows
+        return "n/a"
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return f"{kb / (1024 * 1024 if sys.platform == 'darwin' else 1024):.0f} MB"
 
 # --- External data sources (path, label, type) ---
 DATA_SOURCES = [
@@ -34,33 +47,38 @@ DATA_SOURCES = [
     ("data/urlhaus_full.json", 1, "content")      # JSON with malicious URLs
 ]
 
-# --- Load trained URLs ---
-if os.path.exists(TRAINED_URLS_FILE):
-    with open(TRAINED_URLS_FILE, "r") as f:
-        trained_urls = set(json.load(f))
-else:
-    trained_urls = set()
+# --- Trained URLs (scalable Bloom filter; trained_urls.json is migrated on first use) ---
+from detection.bloom import load_trained_set
+trained_urls = load_trained_set()
 
-# --- Load schema.json ---
-with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
-    schema = json.load(f)
+# --- Read the dataset (only the columns training uses) ---
+from detection.dataset import BUCKETS, load_dataset
+dataset = load_dataset()
 
-# --- Flatten schema into rows ---
+# --- Flatten dataset into rows ---
 rows = []
-for bucket in ["urls", "apps", "content"]:
-    for k, v in schema.get(bucket, {}).items():
+for bucket in BUCKETS:
+    for k, v in dataset.iter_records(bucket, columns=("features", "threat_label", "platform")):
         if k in trained_urls:
             continue
-        row = v.copy()
+        row = v   # a fresh dict holding only the selected columns
         row["id"] = k
         row["type"] = bucket
         row["label"] = 1 if v.get("threat_label", "") != "legit" else 0
         rows.append(row)
 
 # --- Feature extraction functions ---
-from detection.features_url import extract_url_features
-from detection.features_app import extract_app_features
-from detection.features_content import extract_content_features
+from detection.encoder import encode_batch, feature_columns_from, load_feature_columns
+from detection.training_cache import TrainingCache
+from detection.config import TRAINING_CACHE_DIR
+# Features come from the feature store; only missing or stale entries are extracted
+from detection.feature_store import FEATURE_STORE, extract_features
+
+KINDS = {"urls": "url", "apps": "app", "content": "content"}   # bucket -> feature kind
+EXTRACT_CHUNK = 500   # items per store round-trip (and per progress step)
+pruned = FEATURE_STORE.prune()
+if pruned:
+    print(f"Feature store: dropped {pruned} stale entries")
 
 # --- Add all external data sources ---
 for path, label, typ in DATA_SOURCES:
@@ -83,18 +101,16 @@ for path, label, typ in DATA_SOURCES:
                     if url:
                         items.append(url)
 
-    for item in items:
-        if item in trained_urls and not args.force:
-            continue
-        if typ == "urls":
-            features = extract_url_features(item)
-        elif typ == "content":
-            features = extract_content_features(item)
-        else:
-            continue
-        if not features:
-            continue
-        rows.append({"id": item, "type": typ, "label": label, "features": features})
+    if typ not in ("urls", "content"):
+        continue
+    items = [item for item in items if args.force or item not in trained_urls]
+    with tqdm(total=len(items), desc=f"Features for {path}") as bar:
+        for start in range(0, len(items), EXTRACT_CHUNK):
+            chunk = items[start:start + EXTRACT_CHUNK]
+            for item, features in zip(chunk, extract_features(KINDS[typ], chunk)):
+                if features:
+                    rows.append({"id": item, "type": typ, "label": label, "features": features})
+            bar.update(len(chunk))
 
 print(f"✅ Total new rows to process: {len(rows)}")
 
@@ -107,12 +123,8 @@ if not rows and not args.force:
 X_list, y_list, ids_list = [], [], []
 for row in tqdm(rows, desc="Extracting features"):
     if not row.get("features"):
-        if row["type"] == "urls":
-            row["features"] = extract_url_features(row["id"])
-        elif row["type"] == "apps":
-            row["features"] = extract_app_features(row["id"], platform=row.get("platform", "android"))
-        elif row["type"] == "content":
-            row["features"] = extract_content_features(row["id"])
+        row["features"] = extract_features(KINDS[row["type"]], [row["id"]],
+                                           platform=row.get("platform", "android"))[0]
     features = row.get("features", {})
     if not features:
         continue
@@ -124,31 +136,42 @@ if not X_list:
     print("⚠️ No valid feature data found. Exiting...")
     exit()
 
-# Convert to DataFrame and numeric
-import numpy as np
-X_new = pd.DataFrame(X_list).apply(pd.to_numeric, errors='coerce').fillna(0)
+# Encode with the same encoder apply_ml_score uses (stable hashing, float32, clipped)
+FEATURE_COLUMNS = load_feature_columns(FEATURES_FILE_JSON)
+if args.refresh_columns or not FEATURE_COLUMNS:
+    FEATURE_COLUMNS = feature_columns_from(X_list)
+X_new = pd.DataFrame(encode_batch(X_list, FEATURE_COLUMNS), columns=FEATURE_COLUMNS)
 y_new = pd.Series(y_list)
 
-# Replace infinite values and clip extreme values
-X_new = X_new.replace([np.inf, -np.inf], 0)
-X_new = X_new.clip(-1e10, 1e10)  # optional: caps huge values to avoid overflow
-
-# --- Load old training data ---
-X_old, y_old = None, None
-if os.path.exists(OLD_DATA_FILE):
+# --- Replay reservoir: uniform sample of every row trained on so far (memory-mapped columns) ---
+rng = np.random.default_rng(42)
+reservoir = TrainingCache(TRAINING_CACHE_DIR, capacity=MAX_OLD_SAMPLES)
+if not reservoir.rows and os.path.exists(OLD_DATA_FILE):
     try:
-        X_old, y_old = joblib.load(OLD_DATA_FILE)
-        X_old = X_old.reindex(columns=X_new.columns, fill_value=0)
-        if len(X_old) > MAX_OLD_SAMPLES:
-            X_old = X_old.sample(n=MAX_OLD_SAMPLES, random_state=42)
-            y_old = y_old.loc[X_old.index]
-    except Exception:
-        X_old, y_old = None, None
-
-# --- Merge old + new ---
-if X_old is not None and y_old is not None:
-    X_all = pd.concat([X_old, X_new], ignore_index=True)
-    y_all = pd.concat([y_old, y_new], ignore_index=True)
+        data = joblib.load(OLD_DATA_FILE)
+        seen = data[2] if len(data) > 2 else len(data[0])   # older files hold just (X_all, y_all)
+        reservoir.import_frame(data[0], data[1], seen, rng)
+        print(f"✅ Moved {reservoir.rows} rows from {OLD_DATA_FILE} into {TRAINING_CACHE_DIR} (the .pkl is no longer read)")
+    except Exception as e:
+        print(f"⚠️ Could not import {OLD_DATA_FILE}: {e}")
+
+# --- Warm start from the current model when its columns still match ---
+base_model = None
+if not args.force and not args.refresh_columns and os.path.exists(MODEL_FILE_JSON):
+    booster = Booster()
+    booster.load_model(MODEL_FILE_JSON)
+    if booster.feature_names and list(booster.feature_names) != list(FEATURE_COLUMNS):
+        print("⚠️ Saved model has different feature columns; training from scratch.")
+    else:
+        base_model = booster
+
+# --- Training set: new rows + replay (sample of the reservoir when warm starting) ---
+if reservoir.rows:
+    n_replay = reservoir.rows if base_model is None else min(reservoir.rows, args.replay)
+    pick = np.sort(rng.choice(reservoir.rows, size=n_replay, replace=False))
+    X_replay, y_replay = reservoir.frame(X_new.columns, pick)   # reads only the picked rows
+    X_all = pd.concat([X_replay, X_new], ignore_index=True)
+    y_all = pd.concat([y_replay, y_new], ignore_index=True)
 else:
     X_all, y_all = X_new, y_new
 
@@ -164,9 +187,9 @@ X_train, X_test, y_train, y_test = train_test_split(
     X_all, y_all, test_size=0.2, random_state=42, stratify=y_all
 )
 
-# --- Initialize XGBoost ---
+# --- Initialize XGBoost (CPU hist by default; --device cuda where a GPU exists) ---
 model = XGBClassifier(
-    n_estimators=200,
+    n_estimators=200 if base_model is None else args.rounds,
     max_depth=6,
     learning_rate=0.1,
     subsample=0.8,
@@ -175,15 +198,22 @@ model = XGBClassifier(
     random_state=42,
     enable_categorical=True,
     n_jobs=-1,
-    tree_method="gpu_hist",
-    device="cuda",
+    tree_method="hist",
+    device=args.device,
     base_score=0.5
 )
 
 # --- Train model ---
-print(f"Training model on {len(X_train)} samples...")
-model.fit(X_train, y_train)
-print("✅ Training complete!")
+if base_model is None:
+    print(f"Training model from scratch on {len(X_train)} samples...")
+else:
+    print(f"Adding {args.rounds} rounds to the saved model ({base_model.num_boosted_rounds()} trees) "
+          f"on {len(X_train)} samples ({len(X_new)} new, {len(X_all) - len(X_new)} replayed)...")
+train_start = time.perf_counter()
+model.fit(X_train, y_train, xgb_model=base_model)
+train_seconds = time.perf_counter() - train_start
+print(f"✅ Training complete in {train_seconds:.2f}s "
+      f"({model.get_booster().num_boosted_rounds()} trees, peak RSS {peak_rss_mb()})")
 
 # --- Evaluate ---
 y_pred = model.predict(X_test)
@@ -195,16 +225,17 @@ print(classification_report(y_test, y_pred))
 model.save_model(MODEL_FILE_JSON)
 print(f"✅ ML model saved as {MODEL_FILE_JSON}")
 
-FEATURE_COLUMNS = list(X_all.columns)
 with open(FEATURES_FILE_JSON, "w", encoding="utf-8") as f:
     json.dump(FEATURE_COLUMNS, f, indent=2)
 print(f"✅ Feature columns saved as {FEATURES_FILE_JSON}")
 
-# --- Save current training data ---
-joblib.dump((X_all, y_all), OLD_DATA_FILE)
+print(f"✅ Feature store: {FEATURE_STORE.stats()}")
+
+# --- Offer the new rows to the replay reservoir (only replaced slots are written) ---
+reservoir.offer(X_new, y_new, rng)
+print(f"✅ Replay reservoir: {reservoir.rows} of {reservoir.seen} rows seen")
 
 # --- Update trained URLs ---
-trained_urls.update(ids_list)
-with open(TRAINED_URLS_FILE, "w") as f:
-    json.dump(list(trained_urls), f)
-print(f"✅ Updated trained URLs ({len(trained_urls)} total)")
+added = trained_urls.update(ids_list)   # only the new keys' bits are written
+trained_urls.close()
+print(f"✅ Updated trained URLs ({added} added, {len(trained_urls)} total, {trained_urls.stats()['bytes']} bytes)")
@@ -0,0 +1,45 @@
+"""
+Refresh the TLD / public-suffix snapshots bundled in detection/data/.
+
+    python scripts/update_tld_snapshot.py            # download PSL + IANA list
+    python scripts/update_tld_snapshot.py --offline  # rebuild tlds.txt from the bundled PSL
+
+Commit the two files afterwards; detection/tld.py reads them at runtime and
+never touches the network unless FCM_TLD_REFRESH=1.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection.tld import PSL_SNAPSHOT, TLD_SNAPSHOT, IANA_TLD_URL, PSL_URL, tlds_from_psl
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--offline", action="store_true", help="Only rebuild tlds.txt from the bundled PSL")
+args = parser.parse_args()
+
+if not args.offline:
+    import requests
+    resp = requests.get(PSL_URL, timeout=30)
+    resp.raise_for_status()
+    with open(PSL_SNAPSHOT, "w", encoding="utf-8") as f:
+        f.write(resp.text)
+    print(f"✅ Public suffix list saved to {PSL_SNAPSHOT}")
+
+    resp = requests.get(IANA_TLD_URL, timeout=30)
+    resp.raise_for_status()
+    with open(TLD_SNAPSHOT, "w", encoding="utf-8") as f:
+        f.write(resp.text)
+    print(f"✅ IANA TLD list saved to {TLD_SNAPSHOT}")
+else:
+    with open(PSL_SNAPSHOT, "r", encoding="utf-8") as f:
+        psl_text = f.read()
+    version = next((l.split(":", 1)[1].strip() for l in psl_text.splitlines() if l.startswith("// VERSION:")), "unknown")
+    tlds = sorted(tlds_from_psl(psl_text))
+    with open(TLD_SNAPSHOT, "w", encoding="utf-8") as f:
+        f.write(f"# Version {version}, derived from the ICANN section of public_suffix_list.dat "
+                f"on {datetime.utcnow().date().isoformat()}\n")
+        f.write("\n".join(t.upper() for t in tlds) + "\n")
+    print(f"✅ {len(tlds)} TLDs written to {TLD_SNAPSHOT}")
@@ -1,11 +1,12 @@
 import os
-import json
+import sys
 import firebase_admin
 from firebase_admin import credentials, firestore
 
-# Project root (one level up from scripts/)
-ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SCHEMA_FILE = os.path.join(ROOT_DIR, "schema.json")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.config import SHARD_SIZE
+from detection.firestore_shards import BUCKETS, write_sharded
+from detection.dataset import load_dataset
 
 # Firebase key is inside scripts/
 KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fcmfbskp.json")
@@ -15,19 +16,19 @@ cred = credentials.Certificate(KEY_FILE)
 firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# Load schema.json
-if not os.path.exists(SCHEMA_FILE):
-    raise FileNotFoundError(f" schema.json not found at {SCHEMA_FILE}")
-
-with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
-    schema = json.load(f)
+# Dataset (seeded from a legacy schema.json on first use), streamed part file by part file
+dataset = load_dataset()
 
 # Upload to Firestore
 doc_ref = db.collection("threat_data").document("schema")
 
-# Store schema as a single JSON string
-doc_ref.set({
-    "schema_json": json.dumps(schema)   # everything in one field
-})
+# Shards of SHARD_SIZE items under threat_data/schema/<bucket>/, written in
+# batches; the schema document itself only keeps the manifest (this also
+# replaces a legacy "schema_json" field, which hit the 1 MiB document limit)
+counts = write_sharded(
+    db, doc_ref,
+    ((bucket, k, v) for bucket in BUCKETS for k, v in dataset.iter_records(bucket)),
+    shard_size=SHARD_SIZE,
+)
 
-print("schema.json uploaded successfully to Firestore as a single field")
+print(f"Dataset uploaded to Firestore in shards of {SHARD_SIZE}: {counts}")
@@ -1,11 +1,26 @@
 # server.py
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from detection.engine import score_url, score_app, score_content
+from detection.engine import score_url_async, score_app, score_content, load_model, Overloaded, ProbeLimiter
+from detection.provisional import DETECTIONS, provisional_score, enrich
+from detection.result_cache import RESULT_CACHE
+from detection.config import REQUEST_DEADLINE
 from fastapi.middleware.cors import CORSMiddleware
 
+# One limiter for the whole process: caps probes in flight, sheds load with 503
+PROBE_LIMITER = ProbeLimiter()
+# Background enrichment tasks (kept referenced until they finish)
+_ENRICH_TASKS = set()
+
+@asynccontextmanager
+async def lifespan(app):
+    load_model()   # load the booster before the first request instead of inside it
+    yield
+
 # --- Initialize app ---
-app = FastAPI(title="FakeCatcherMan API")
+app = FastAPI(title="FakeCatcherMan API", lifespan=lifespan)
 
 # --- Enable CORS for local React frontend ---
 app.add_middleware(
@@ -30,32 +45,82 @@ class ContentInput(BaseModel):
     url: str
     sector: str = "general"
 
+async def _score_url_limited(u, sector="general"):
+    return await score_url_async(u, sector, deadline=REQUEST_DEADLINE, limiter=PROBE_LIMITER)
+
+async def _enrich_and_cache(detection_id, key, sector):
+    result = await enrich(detection_id, key[1], sector, limiter=PROBE_LIMITER)
+    if result is not None:
+        RESULT_CACHE.set(key, result)
+
 # --- Endpoints ---
+# Handlers are async: URL probes are awaited (bounded by PROBE_LIMITER and
+# REQUEST_DEADLINE), app/content scoring is offline and runs inline.
 @app.post("/detect/url")
-def detect_url(data: URLInput):
+async def detect_url(data: URLInput):
     """
-    Detect fraud for a URL
+    Detect fraud for a URL. If the network probes miss the request deadline the
+    result is returned anyway with "partial": true.
     """
-    result = score_url(data.url, data.sector)
+    try:
+        result = await RESULT_CACHE.get_or_score_async("url", data.url, _score_url_limited, sector=data.sector)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
     return {"url": data.url, "result": result}  # <- wrap in "result"
 
+@app.post("/detect/url/fast")
+async def detect_url_fast(data: URLInput):
+    """
+    Offline (lexical) verdict right away, marked "provisional" with a
+    detection_id. SSL/redirect/reachability checks continue in the background;
+    poll /detect/result/{detection_id} for the final result. A cached full
+    result is returned directly instead.
+    """
+    key = RESULT_CACHE.key("url", data.url, sector=data.sector)
+    cached = RESULT_CACHE.get(key)   # a copy: marking it leaves the cache entry as stored
+    if cached is not None:
+        return {"url": data.url, "result": RESULT_CACHE.as_hit(cached)}
+    result = provisional_score(key[1], data.sector)
+    result["cached"] = False
+    task = asyncio.create_task(_enrich_and_cache(result["detection_id"], key, data.sector))
+    _ENRICH_TASKS.add(task)
+    task.add_done_callback(_ENRICH_TASKS.discard)
+    return {"url": data.url, "result": result}
+
+@app.get("/detect/result/{detection_id}")
+async def detection_result(detection_id: str):
+    """
+    status: "pending" (provisional result), "final", "partial" (network
+    checks timed out; result marked "partial"), or "unavailable"/"error"
+    when enrichment could not run (provisional result kept).
+    """
+    entry = DETECTIONS.get(detection_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired detection_id")
+    return {"detection_id": detection_id, "status": entry["status"], "result": entry["result"]}
+
 @app.post("/detect/app")
-def detect_app(data: AppInput):
+async def detect_app(data: AppInput):
     """
     Detect fraud for an app (APK or IPA)
     """
-    result = score_app(data.url, platform=data.platform, sector=data.sector)
+    result = RESULT_CACHE.get_or_score("app", data.url, score_app, platform=data.platform, sector=data.sector)
     return {"url": data.url, "result": result}  # <- wrap in "result"
 
 @app.post("/detect/content")
-def detect_content(data: ContentInput):
+async def detect_content(data: ContentInput):
     """
     Detect fraud for uploaded content/file URL
     """
-    result = score_content(data.url, data.sector)
+    result = RESULT_CACHE.get_or_score("content", data.url, score_content, sector=data.sector)
     return {"url": data.url, "result": result}  # <- wrap in "result"
 
 # --- Health check endpoint ---
 @app.get("/health")
-def health_check():
-    return {"status": "OK", "message": "FakeCatcherMan API is running"}
+async def health_check():
+    return {"status": "OK", "message": "FakeCatcherMan API is running", "probes": PROBE_LIMITER.stats(),
+            "detections": DETECTIONS.stats(), "result_cache": RESULT_CACHE.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return RESULT_CACHE.stats()